@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AdmissionController:
+    """Decides per request whether ML scoring runs or the cheap path answers.
+
+    Tracks requests in flight and an exponentially weighted average of
+    scoring latency. Past max_in_flight, or once the average exceeds
+    latency_target, requests are shed to the degraded path. While degraded
+    one probe request every probe_interval still runs the model, so the
+    average can fall and scoring switches back once it is below
+    recover_ratio * latency_target.
+    """
+
+    def __init__(self, max_in_flight=8, latency_target=0.5, recover_ratio=0.7,
+                 probe_interval=1.0, smoothing=0.2):
+        self.max_in_flight = max_in_flight
+        self.latency_target = latency_target
+        self.recover_ratio = recover_ratio
+        self.probe_interval = probe_interval
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency = 0.0
+        self.degraded = False
+        self._next_probe = 0.0
+        self.counts = {'admitted': 0, 'shed': 0, 'degraded_since': None}
+
+    def try_acquire(self):
+        """True if this request may run ML scoring; pair with release()"""
+        now = time.monotonic()
+        with self._lock:
+            if self.in_flight >= self.max_in_flight or (self.degraded and now < self._next_probe):
+                self.counts['shed'] += 1
+                return False
+            if self.degraded:
+                self._next_probe = now + self.probe_interval
+            self.in_flight += 1
+            self.counts['admitted'] += 1
+            return True
+
+    def release(self, elapsed):
+        with self._lock:
+            self.in_flight -= 1
+            self.latency += self.smoothing * (elapsed - self.latency)
+            if not self.degraded and self.latency > self.latency_target:
+                self.degraded = True
+                self._next_probe = time.monotonic() + self.probe_interval
+                self.counts['degraded_since'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                logger.warning("⚠️ Scoring latency %.0fms, degrading to basic search", self.latency * 1000)
+            elif self.degraded and self.latency < self.latency_target * self.recover_ratio:
+                self.degraded = False
+                self.counts['degraded_since'] = None
+                logger.info("✅ Scoring latency %.0fms, ML scoring resumed", self.latency * 1000)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'degraded': self.degraded,
+                'in_flight': self.in_flight,
+                'latency_ms': round(self.latency * 1000, 1),
+                'max_in_flight': self.max_in_flight,
+                'latency_target_ms': round(self.latency_target * 1000, 1),
+                **self.counts
+            }
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counts = {'computed': 0, 'shared': 0}
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                self.counts['computed'] += 1
+            else:
+                self.counts['shared'] += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = compute()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, in_flight=len(self._calls))
+
+
+class ResultCache:
+    """Small thread-safe LRU of recent full answers, served while degraded"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
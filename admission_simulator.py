@@ -0,0 +1,183 @@
+import time
+import warnings
+
+import numpy as np
+
+ROUND_ORDER = ('First Round', 'Second Round', 'Third Round')
+
+
+class AdmissionSimulator:
+    """Round-by-round seat allocation over the cutoff tensor.
+
+    A synthetic student population (rank, category, taste for each
+    college) goes through First/Second/Third Round. In each round a
+    student can hold any college whose cutoff for their category is at or
+    above their rank. Students keep their seat from the previous round
+    unless they can upgrade. With seat capacities, each round runs a
+    vectorized student-proposing deferred acceptance where colleges keep
+    the best ranked proposers. Without capacities, every student simply
+    gets their favourite admissible college. Works on 100k students in
+    seconds.
+    """
+
+    def __init__(self, cutoff_tensor, round_names, category_names, college_codes):
+        rounds = [r for r in ROUND_ORDER if r in round_names] or list(round_names)
+        self.round_names = rounds
+        # (college, round, category) restricted to the simulated rounds, in order
+        self.cutoffs = cutoff_tensor[:, [round_names.index(r) for r in rounds], :]
+        self.category_names = list(category_names)
+        self.category_index = {category: i for i, category in enumerate(self.category_names)}
+        self.college_codes = list(college_codes)
+        self.college_index = {code: i for i, code in enumerate(self.college_codes)}
+
+    @classmethod
+    def from_predictor(cls, predictor):
+        return cls(predictor.cutoff_tensor, predictor.round_names, predictor.category_names, predictor.college_codes)
+
+    def college_desirability(self):
+        """Colleges with lower (more competitive) cutoffs are more popular"""
+        cutoffs = self.cutoffs.astype(float)
+        cutoffs[cutoffs == 0] = np.nan
+        with warnings.catch_warnings():
+            # All-NaN rows are colleges without any cutoff; they get the least popular value below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            typical = np.nanmedian(cutoffs.reshape(len(self.college_codes), -1), axis=1)
+        typical = np.where(np.isnan(typical), np.nanmax(typical), typical)
+        return -(typical - typical.mean()) / (typical.std() or 1.0)
+
+    def synthetic_population(self, n_students, category_shares=None, max_rank=None, taste_noise=1.0, seed=42):
+        """Draw ranks, categories and per-college utilities for n students"""
+        rng = np.random.default_rng(seed)
+        max_rank = max_rank or int(self.cutoffs.max())
+
+        if n_students <= max_rank:
+            ranks = rng.choice(max_rank, size=n_students, replace=False) + 1
+        else:
+            ranks = rng.integers(1, max_rank + 1, size=n_students)
+
+        if category_shares is None:
+            # Every category that has at least one cutoff, equally likely
+            offered = np.flatnonzero((self.cutoffs > 0).any(axis=(0, 1)))
+            shares = np.zeros(len(self.category_names))
+            shares[offered] = 1.0
+        else:
+            shares = np.array([category_shares.get(c, 0.0) for c in self.category_names], dtype=float)
+        categories = rng.choice(len(self.category_names), size=n_students, p=shares / shares.sum())
+
+        # Shared desirability plus Gumbel taste noise per student
+        utilities = (self.college_desirability()[None, :]
+                     + taste_noise * rng.gumbel(size=(n_students, len(self.college_codes)))).astype(np.float32)
+        return ranks.astype(np.int32), categories.astype(np.int16), utilities
+
+    def simulate(self, ranks, categories, utilities, capacities=None):
+        """Allocate every student round by round.
+
+        capacities is None (cutoffs are the only constraint) or an array of
+        seats per (college, category). Returns an (n_students, n_rounds)
+        array of held college indices, -1 for no seat.
+        """
+        n_students = len(ranks)
+        held = np.full(n_students, -1, dtype=np.int32)
+        assignments = np.empty((n_students, len(self.round_names)), dtype=np.int32)
+
+        for r in range(len(self.round_names)):
+            # (student, college) admissibility for this round
+            student_cutoffs = self.cutoffs[:, r, :][:, categories].T
+            admissible = (student_cutoffs > 0) & (ranks[:, None] <= student_cutoffs)
+            has_seat = held >= 0
+            admissible[np.flatnonzero(has_seat), held[has_seat]] = True
+
+            masked = np.where(admissible, utilities, -np.inf)
+            if capacities is None:
+                choice = masked.argmax(axis=1).astype(np.int32)
+                held = np.where(admissible.any(axis=1), choice, -1)
+            else:
+                held = self._deferred_acceptance(ranks, categories, masked, admissible, held, capacities)
+            assignments[:, r] = held
+
+        return assignments
+
+    def _deferred_acceptance(self, ranks, categories, masked, admissible, held, capacities):
+        """Vectorized student-proposing deferred acceptance for one round"""
+        n_students = len(ranks)
+        n_categories = len(self.category_names)
+        preference = np.argsort(-masked, axis=1)
+        options = admissible.sum(axis=1)
+        next_choice = np.zeros(n_students, dtype=np.int32)
+        assigned = np.full(n_students, -1, dtype=np.int32)
+
+        priority = ranks.astype(np.int64)
+        seats = np.asarray(capacities).reshape(-1)
+
+        while True:
+            proposing = np.flatnonzero((assigned < 0) & (next_choice < options))
+            if not len(proposing):
+                break
+            assigned[proposing] = preference[proposing, next_choice[proposing]]
+            next_choice[proposing] += 1
+
+            applicants = np.flatnonzero(assigned >= 0)
+            bucket = assigned[applicants].astype(np.int64) * n_categories + categories[applicants]
+            # Seats held from the previous round cannot be taken away
+            protected = assigned[applicants] == held[applicants]
+            key = np.where(protected, -1, priority[applicants])
+
+            order = np.lexsort((key, bucket))
+            sorted_bucket = bucket[order]
+            starts = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+            position = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+            rejected = applicants[order[(position >= seats[sorted_bucket]) & (key[order] >= 0)]]
+            assigned[rejected] = -1
+
+        return assigned
+
+    def probability_table(self, ranks, categories, assignments, rank_bucket=500):
+        """P(getting college X in round R or earlier) per (category, rank bucket).
+
+        Students only ever move to colleges they prefer, so a seat first
+        held in round R is counted once and carried into later rounds.
+        Returns an array indexed [category, rank bucket, round, college].
+        """
+        n_buckets = int(ranks.max()) // rank_bucket + 1
+        n_rounds, n_colleges = assignments.shape[1], len(self.college_codes)
+        counts = np.zeros((len(self.category_names), n_buckets, n_rounds, n_colleges))
+        totals = np.zeros((len(self.category_names), n_buckets))
+
+        buckets = ranks // rank_bucket
+        np.add.at(totals, (categories, buckets), 1)
+        for r in range(n_rounds):
+            if r:
+                counts[:, :, r] = counts[:, :, r - 1]
+            arrived = assignments[:, r] >= 0
+            if r:
+                arrived &= assignments[:, r] != assignments[:, r - 1]
+            np.add.at(counts, (categories[arrived], buckets[arrived], r, assignments[arrived, r]), 1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.nan_to_num(counts / totals[:, :, None, None])
+
+    def admission_probability(self, table, student_rank, category, college_code, round_name, rank_bucket=500):
+        """Look up P(college by round) for one student from a probability table"""
+        c = self.category_index[category]
+        bucket = min(student_rank // rank_bucket, table.shape[1] - 1)
+        return float(table[c, bucket, self.round_names.index(round_name), self.college_index[college_code]])
+
+
+if __name__ == "__main__":
+    from advanced_ml_predictor import AdvancedPGCETPredictor
+
+    simulator = AdmissionSimulator.from_predictor(AdvancedPGCETPredictor())
+
+    started = time.perf_counter()
+    ranks, categories, utilities = simulator.synthetic_population(100_000)
+    assignments = simulator.simulate(ranks, categories, utilities)
+    table = simulator.probability_table(ranks, categories, assignments)
+    print(f"🎲 Simulated {len(ranks)} students in {time.perf_counter() - started:.2f}s")
+
+    for r, round_name in enumerate(simulator.round_names):
+        print(f"   {round_name}: {(assignments[:, r] >= 0).mean():.1%} hold a seat")
+
+    college = simulator.college_codes[0]
+    for round_name in simulator.round_names:
+        p = simulator.admission_probability(table, 3000, 'GM', college, round_name)
+        print(f"   P({college} by {round_name} | rank 3000, GM) = {p:.1%}")
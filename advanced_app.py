@@ -1,67 +1,185 @@
-from flask import Flask, request, jsonify, render_template_string
+# Measured from the start of module import, before Flask, numpy and our own
+# modules load, so gunicorn workers can report how long it took before they
+# were able to answer their first request.
+import time
+APP_STARTED_AT = time.perf_counter()
+
+from flask import Flask, request, jsonify, render_template_string, send_from_directory
+from werkzeug.security import safe_join
 from flask_cors import CORS
 import json
 import os
-import requests
+import threading
 from datetime import datetime
 
+import numpy as np
+
+from admission_control import AdmissionController, ResultCache, SingleFlight
+from college_index import CollegeBitsetIndex
+from college_search import CollegeSearchIndex
+from cutoff_bundle import BUNDLE_FILE, build_bundle
+from cutoff_store import CutoffStore
+from http_cache import PrecompressedPage, compress_response, conditional_json, not_modified
+from model_artifact_store import ModelArtifactStore
+from pgcet_records import CATEGORIES, CollegePrediction, load_college_records, serialize
+from prediction_export import EXPORT_DIR, file_sha256
+from rate_limit import TokenBucketLimiter
+from scoring_registry import SCORING_REGISTRY, ShadowEvaluator
+from structured_logging import bind_correlation_id, configure_logging, correlation_id, get_logger
+
+# Log records are queued and written by a listener thread, off the request path
+configure_logging()
+logger = get_logger('app')
+
 app = Flask(__name__)
 CORS(app)
 
 # Google Drive direct download URL for your ML model
 MODEL_DOWNLOAD_URL = "https://drive.google.com/uc?export=download&id=1KaTsdYcRwxSOJTyfhc8FHyz-HYAXSb-a"
+# sha256 of the file at MODEL_DOWNLOAD_URL, pinned when the model is published
+# (PGCET_MODEL_SHA256 overrides it, PGCET_MODEL_SHA256_URL points at a published
+# sha256sum line instead). Without either, a download is only kept if it loads
+# as a saved model, which rejects truncated files and Drive's HTML pages.
+MODEL_SHA256 = None
 
-def download_from_google_drive(url, filename):
-    """Download file from Google Drive if it doesn't exist locally"""
-    if os.path.exists(filename):
-        print(f"✅ {filename} already exists locally")
-        return True
-    
+# 'background' serves basic_search while the model loads in a thread,
+# 'eager' blocks startup until the model is loaded (the old behaviour).
+STARTUP_MODE = os.environ.get('PGCET_STARTUP_MODE', 'background')
+STARTUP_TARGET_SECONDS = float(os.environ.get('PGCET_STARTUP_TARGET_SECONDS', '2.0'))
+
+# Any scoring_registry engine: 'ensemble' (trained sklearn models), 'regressor'
+# (the probability model alone) or 'analytic' (closed-form, microseconds)
+SCORING_ENGINE = os.environ.get('PGCET_SCORING_ENGINE', 'ensemble')
+# Engines re-scoring a sample of served requests in the background, e.g.
+# PGCET_SHADOW_ENGINES=analytic,regressor; their metrics are in /api/data-status
+SHADOW_ENGINES = [name.strip() for name in os.environ.get('PGCET_SHADOW_ENGINES', '').split(',') if name.strip()]
+shadow_scoring = ShadowEvaluator(
+    SHADOW_ENGINES, sample_rate=float(os.environ.get('PGCET_SHADOW_RATE', '0.05'))
+) if SHADOW_ENGINES else None
+
+startup_stats = {
+    'mode': STARTUP_MODE,
+    'target_seconds': STARTUP_TARGET_SECONDS,
+    'first_request_seconds': None,
+    'model_ready_seconds': None,
+    'model_load_error': None
+}
+_first_request_lock = threading.Lock()
+
+# Past this many scoring requests in flight, or this average scoring latency,
+# /api/predict-mobile sheds to a cached answer or basic_search
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get('PGCET_MAX_IN_FLIGHT', '8')),
+    latency_target=float(os.environ.get('PGCET_LATENCY_TARGET_MS', '500')) / 1000
+)
+recent_predictions = ResultCache()
+# Identical concurrent predictions in a worker wait for one computation
+predictions_in_flight = SingleFlight()
+
+# (tokens per second, burst) per client; refresh allows two reloads, then one a minute
+# PGCET_API_KEYS (comma separated) get their own buckets; anyone else is limited per IP
+rate_limiter = TokenBucketLimiter({
+    'predict': (float(os.environ.get('PGCET_PREDICT_RATE', '2')), int(os.environ.get('PGCET_PREDICT_BURST', '20'))),
+    'refresh': (1 / 60, 2)
+}, api_keys=[key.strip() for key in os.environ.get('PGCET_API_KEYS', '').split(',') if key.strip()])
+
+def check_model_file(path):
+    from advanced_ml_predictor import AdvancedPGCETPredictor
+    AdvancedPGCETPredictor.check_model_file(path)
+
+# A verified advanced_pgcet_model.pkl next to the app (where it was downloaded
+# before the cache existed) is used when the download fails
+model_store = ModelArtifactStore(
+    os.environ.get('PGCET_MODEL_URL', MODEL_DOWNLOAD_URL),
+    filename='advanced_pgcet_model.pkl',
+    cache_dir=os.environ.get('PGCET_MODEL_CACHE_DIR', 'model_cache'),
+    sha256=os.environ.get('PGCET_MODEL_SHA256', MODEL_SHA256),
+    version=os.environ.get('PGCET_MODEL_VERSION'),
+    sha256_url=os.environ.get('PGCET_MODEL_SHA256_URL'),
+    validate=check_model_file,
+    local_path='advanced_pgcet_model.pkl'
+)
+
+# Memory-mapped cutoffs shared by all workers on the host, rebuilt when the JSON changes
+CUTOFF_STORE_PATH = os.environ.get('PGCET_CUTOFF_STORE', 'pgcet_cutoffs.bin')
+_cutoff_store = None
+_cutoff_store_lock = threading.Lock()
+
+def get_cutoff_store():
+    global _cutoff_store
+    store = _cutoff_store
+    if store is None:
+        with _cutoff_store_lock:
+            if _cutoff_store is None:
+                _cutoff_store = CutoffStore.build('combined_pgcet_data.json', CUTOFF_STORE_PATH)
+            store = _cutoff_store
+    else:
+        # Another worker may have renamed a rebuilt file into place
+        store.remap_if_changed()
+    return store
+
+def publish_model(model_path):
+    """Load a verified model file and publish it as the global predictor"""
+    global predictor
     try:
-        print(f"📥 Downloading {filename} from Google Drive...")
-        response = requests.get(url, stream=True)
-        
-        if response.status_code == 200:
-            total_size = int(response.headers.get('content-length', 0))
-            
-            with open(filename, 'wb') as f:
-                downloaded = 0
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        # Show progress for large files
-                        if total_size > 0 and downloaded % (1024*1024) == 0:  # Every 1MB
-                            percent = (downloaded / total_size) * 100
-                            print(f"📊 Progress: {percent:.1f}%")
-            
-            print(f"✅ Successfully downloaded {filename}")
-            return True
-        else:
-            print(f"❌ Failed to download {filename}. Status code: {response.status_code}")
-            return False
-            
+        predictor = load_model_artifact(model_path)
+        recent_predictions.clear()
+        startup_stats['model_ready_seconds'] = round(time.perf_counter() - APP_STARTED_AT, 3)
+        logger.info("✅ ML models loaded in %ss", startup_stats['model_ready_seconds'])
     except Exception as e:
-        print(f"❌ Error downloading {filename}: {str(e)}")
-        return False
+        record_model_error(e)
 
-# Load the ML model with Google Drive integration
-try:
-    # Download model from Google Drive if needed
-    model_downloaded = download_from_google_drive(MODEL_DOWNLOAD_URL, 'advanced_pgcet_model.pkl')
-    
-    if model_downloaded:
-        from advanced_ml_predictor import AdvancedPGCETPredictor
-        predictor = AdvancedPGCETPredictor.load_models('advanced_pgcet_model.pkl', 'combined_pgcet_data.json')
-        print("✅ ML models loaded successfully from Google Drive")
-    else:
-        predictor = None
-        print("⚠️ Using fallback mode - ML model download failed")
-        
-except Exception as e:
-    print(f"⚠️ Using fallback mode: {e}")
-    predictor = None
+def load_model_artifact(model_path):
+    """Load a fetched model; an artifact that does not load is discarded rather than reused on every start"""
+    from advanced_ml_predictor import AdvancedPGCETPredictor
+    store = get_cutoff_store()
+    try:
+        loaded = AdvancedPGCETPredictor.load_models(model_path, 'combined_pgcet_data.json', SCORING_ENGINE, store)
+    except Exception:
+        model_store.discard()
+        raise
+    loaded.shadow = shadow_scoring
+    return loaded
+
+def record_model_error(error):
+    startup_stats['model_load_error'] = str(error)
+    logger.warning("⚠️ Using fallback mode: %s", error)
+
+def load_ml_model():
+    """Fetch the model through the artifact store and load it"""
+    try:
+        publish_model(model_store.fetch())
+    except Exception as e:
+        record_model_error(e)
+
+# basic_search answers requests until load_ml_model publishes the predictor
+predictor = None
+
+if STARTUP_MODE == 'eager':
+    load_ml_model()
+else:
+    model_store.fetch_in_background(publish_model, record_model_error)
+
+@app.before_request
+def bind_request_id():
+    # Honour an id set by a proxy so its logs and ours can be joined
+    bind_correlation_id(request.headers.get('X-Request-ID', '')[:64] or None)
+
+@app.after_request
+def return_request_id(response):
+    response.headers['X-Request-ID'] = correlation_id.get()
+    return response
+
+@app.before_request
+def record_first_request():
+    if startup_stats['first_request_seconds'] is not None:
+        return
+    with _first_request_lock:
+        if startup_stats['first_request_seconds'] is None:
+            elapsed = round(time.perf_counter() - APP_STARTED_AT, 3)
+            startup_stats['first_request_seconds'] = elapsed
+            if elapsed > STARTUP_TARGET_SECONDS:
+                logger.warning("⚠️ First request served %ss after startup (target %ss)", elapsed, STARTUP_TARGET_SECONDS)
 
 # Rest of your Flask app code continues here...
 
@@ -857,10 +975,146 @@ MOBILE_HTML = '''
     <script>
         let currentStudentRank = 0;
         let currentCategory = '';
+        const PREDICTIONS_URL = {{ predictions_url|tojson }};
+        let predictionManifest;
+        let cutoffBundle = null;
+        
+        // One IndexedDB record holds the last cutoff bundle this device downloaded
+        function bundleStore(mode, buffer) {
+            return new Promise((resolve, reject) => {
+                const open = indexedDB.open('pgcet-offline', 1);
+                open.onupgradeneeded = () => open.result.createObjectStore('bundle');
+                open.onerror = () => reject(open.error);
+                open.onsuccess = () => {
+                    const store = open.result.transaction('bundle', mode).objectStore('bundle');
+                    const request = mode === 'readonly' ? store.get('cutoffs') : store.put(buffer, 'cutoffs');
+                    request.onsuccess = () => resolve(request.result);
+                    request.onerror = () => reject(request.error);
+                };
+            });
+        }
+        
+        // Magic, header length, JSON header, padding, then int32 (college, round, category) cutoffs
+        function decodeBundle(buffer) {
+            const length = new DataView(buffer).getUint32(4, true);
+            const bundle = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, length)));
+            const [colleges, rounds, categories] = bundle.shape;
+            bundle.cutoffs = new Int32Array(buffer, Math.ceil((8 + length) / 4) * 4, colleges * rounds * categories);
+            return bundle;
+        }
+        
+        async function loadCutoffBundle() {
+            if (typeof indexedDB !== 'undefined') {
+                try {
+                    const stored = await bundleStore('readonly');
+                    if (stored) cutoffBundle = decodeBundle(stored);
+                } catch (error) {}
+            }
+            try {
+                const response = await fetch('/api/cutoff-bundle', {cache: 'no-cache'});
+                if (!response.ok) return;
+                const buffer = await response.arrayBuffer();
+                const fresh = decodeBundle(buffer);
+                if (!cutoffBundle || cutoffBundle.version !== fresh.version) {
+                    cutoffBundle = fresh;
+                    if (typeof indexedDB !== 'undefined') bundleStore('readwrite', buffer).catch(() => {});
+                }
+            } catch (error) {
+                // Offline: keep whatever IndexedDB had
+            }
+        }
+        
+        // basic_search on the device: primary cutoffs at or above the rank, best 20
+        function localSearch(rank, category) {
+            const bundle = cutoffBundle;
+            const c = bundle.categories.indexOf(category);
+            const [count, rounds, categories] = bundle.shape;
+            const matches = [];
+            for (let i = 0; c >= 0 && i < count; i++) {
+                const cutoff = bundle.cutoffs[i * rounds * categories + c];
+                if (cutoff > 0 && cutoff >= rank) matches.push([cutoff, i]);
+            }
+            matches.sort((a, b) => a[0] - b[0] || a[1] - b[1]);
+            const colleges = matches.slice(0, 20).map(([cutoff, i]) => ({
+                college_code: bundle.colleges[i][0],
+                college_name: bundle.colleges[i][1],
+                location: bundle.colleges[i][2],
+                city: bundle.colleges[i][3],
+                cutoff_rank: cutoff,
+                best_round: 'First Round',
+                admission_probability: 0.8,
+                safety_level: 'Eligible',
+                rank_difference: cutoff - rank
+            }));
+            return {success: true, student_rank: rank, category: category, mode: 'offline',
+                    total_colleges: colleges.length, colleges: colleges};
+        }
+        
+        // Mirrors AdvancedPGCETPredictor.calculate_safety_level
+        function safetyLevel(rank, cutoff) {
+            const difference = cutoff - rank;
+            if (difference > 1500) return 'Very Safe';
+            if (difference > 800) return 'Safe';
+            if (difference > 300) return 'Moderate';
+            if (difference > 0) return 'Competitive';
+            return 'Reach';
+        }
+        
+        // Default-preference answers from the exported shards, null to ask the API.
+        // An exported rank is answered exactly (final); any other rank gets the
+        // rows of the exported rank below it whose cutoff still admits it, shown
+        // while the API computes the exact answer.
+        async function staticPrediction(rank, category) {
+            if (!PREDICTIONS_URL || typeof DecompressionStream === 'undefined') return null;
+            try {
+                // Shards exported from other data or another model are stale: ask the API
+                const live = (await currentDataStatus()).predictions;
+                const matches = manifest => manifest && live && manifest.data_sha256 === live.data_sha256 &&
+                    (!live.model_sha256 || manifest.model_sha256 === live.model_sha256);
+                if (predictionManifest === undefined || (predictionManifest && !matches(predictionManifest))) {
+                    const response = await fetch(`${PREDICTIONS_URL}/manifest.json`, {cache: 'no-cache'});
+                    predictionManifest = response.ok ? await response.json() : null;
+                }
+                if (!matches(predictionManifest)) return null;
+                const entry = predictionManifest.categories[category];
+                if (!entry) return null;
+                
+                const gridRank = Math.floor(rank / predictionManifest.step) * predictionManifest.step;
+                if (gridRank < predictionManifest.step) return null;
+                let colleges = [];
+                if (rank <= entry.max_rank) {
+                    const bucket = Math.floor((gridRank - 1) / predictionManifest.bucket_size) * predictionManifest.bucket_size + 1;
+                    const shardInfo = entry.shards[bucket];
+                    if (!shardInfo) return null;
+                    const response = await fetch(`${PREDICTIONS_URL}/${shardInfo.file}?v=${shardInfo.sha256.slice(0, 12)}`);
+                    if (!response.ok) return null;
+                    const stream = (await response.blob()).stream().pipeThrough(new DecompressionStream('gzip'));
+                    const shard = await new Response(stream).json();
+                    colleges = (shard.ranks[gridRank] || []).filter(row => row[1] >= rank).map(([code, cutoff, round, probability]) => ({
+                        college_code: code,
+                        college_name: shard.colleges[code][0],
+                        location: shard.colleges[code][1],
+                        city: shard.colleges[code][2],
+                        cutoff_rank: cutoff,
+                        best_round: round,
+                        admission_probability: probability,
+                        safety_level: safetyLevel(rank, cutoff),
+                        rank_difference: cutoff - rank
+                    }));
+                }
+                // Past the highest cutoff nothing is eligible, whatever the rank
+                const final = gridRank === rank || rank > entry.max_rank;
+                return {success: true, student_rank: rank, category: category, mode: final ? 'static' : 'static-provisional',
+                        final: final, total_colleges: colleges.length, colleges: colleges};
+            } catch (error) {
+                return null;
+            }
+        }
         
         // Initialize app
         document.addEventListener('DOMContentLoaded', function() {
             loadDataStatus();
+            loadCutoffBundle();
         });
         
         // Menu Toggle
@@ -898,11 +1152,22 @@ MOBILE_HTML = '''
             }
         }
         
+        // /api/data-status, re-read at most once a minute
+        let dataStatus = null;
+        let dataStatusAt = 0;
+        async function currentDataStatus(force) {
+            if (force || !dataStatus || Date.now() - dataStatusAt > 60000) {
+                const response = await fetch('/api/data-status');
+                dataStatus = await response.json();
+                dataStatusAt = Date.now();
+            }
+            return dataStatus;
+        }
+        
         // Load Data Status
         async function loadDataStatus() {
             try {
-                const response = await fetch('/api/data-status');
-                const data = await response.json();
+                const data = await currentDataStatus(true);
                 
                 document.getElementById('lastUpdated').textContent = data.last_updated || 'Unknown';
                 document.getElementById('totalColleges').textContent = data.total_colleges || 'Unknown';
@@ -962,15 +1227,30 @@ MOBILE_HTML = '''
             currentStudentRank = parseInt(rank);
             currentCategory = category;
             
-            // Show loading
-            document.getElementById('results').innerHTML = `
-                <div class="loading">
-                    <h2><i class="fas fa-spinner"></i>Finding colleges...</h2>
-                    <p>Checking cutoff requirements</p>
-                </div>
-            `;
+            // Eligibility from the offline bundle right away; ML probabilities replace it when they arrive
+            if (cutoffBundle) {
+                displayResults(localSearch(currentStudentRank, category));
+            } else {
+                // Show loading
+                document.getElementById('results').innerHTML = `
+                    <div class="loading">
+                        <h2><i class="fas fa-spinner"></i>Finding colleges...</h2>
+                        <p>Checking cutoff requirements</p>
+                    </div>
+                `;
+            }
             
+            let provisional = false;
             try {
+                if (!preferredCity) {
+                    const cached = await staticPrediction(currentStudentRank, category);
+                    if (cached) {
+                        displayResults(cached);
+                        if (cached.final) return;
+                        provisional = true;
+                    }
+                }
+                
                 const response = await fetch('/api/predict-mobile', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
@@ -986,6 +1266,8 @@ MOBILE_HTML = '''
                 const data = await response.json();
                 displayResults(data);
             } catch (error) {
+                // Offline with a bundle or shard: those results are already showing
+                if (cutoffBundle || provisional) return;
                 alert('Error: ' + error.message);
                 document.getElementById('results').innerHTML = '';
             }
@@ -1127,11 +1409,87 @@ MOBILE_HTML = '''
 </html>
 '''
 
+# Default-preference answers exported by prediction_export.py. The page reads
+# them from PGCET_PREDICTIONS_URL (e.g. a CDN copy of the directory) and
+# only calls /api/predict-mobile for other preferences or missing shards.
+PREDICTIONS_DIR = os.environ.get('PGCET_PREDICTIONS_DIR', EXPORT_DIR)
+PREDICTIONS_URL = os.environ.get('PGCET_PREDICTIONS_URL', '/predictions')
+_file_hashes = {}
+
+def cached_file_sha256(path):
+    """file_sha256, recomputed only when the file's inode, size or mtime change"""
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    cached = _file_hashes.get(path)
+    if cached is None or cached[0] != key:
+        cached = _file_hashes[path] = (key, file_sha256(path))
+    return cached[1]
+
+def live_prediction_hashes():
+    """What a shard manifest must record to still match the served data and model"""
+    return {
+        'data_sha256': cached_file_sha256('combined_pgcet_data.json'),
+        'model_sha256': cached_file_sha256(getattr(predictor, 'model_file', None))
+    }
+
+# Rendered and compressed once; home() and the HTML error pages only pick a variant
+with app.app_context():
+    MOBILE_PAGE = PrecompressedPage(render_template_string(MOBILE_HTML, predictions_url=PREDICTIONS_URL))
+
+app.after_request(compress_response)
+
+COLLEGE_CACHE_CONTROL = 'public, max-age=300'
+
+def data_version():
+    """Content hash of the current cutoff store, the version JSON ETags are built from"""
+    return get_cutoff_store().snapshot().version
+
 @app.route('/')
 def home():
-    return render_template_string(MOBILE_HTML)
+    return MOBILE_PAGE.response()
+
+# Compact cutoffs the mobile page keeps in IndexedDB for instant, offline eligibility search
+CUTOFF_BUNDLE_PATH = os.environ.get('PGCET_CUTOFF_BUNDLE', BUNDLE_FILE)
+_cutoff_bundle = {'mtime': None, 'page': None}
+_cutoff_bundle_lock = threading.Lock()
+
+def get_cutoff_bundle():
+    """The bundle as a pre-compressed response body, rebuilt when the college JSON changes"""
+    build_bundle('combined_pgcet_data.json', CUTOFF_BUNDLE_PATH)
+    mtime = os.path.getmtime(CUTOFF_BUNDLE_PATH)
+    if _cutoff_bundle['mtime'] != mtime:
+        with _cutoff_bundle_lock:
+            if _cutoff_bundle['mtime'] != mtime:
+                with open(CUTOFF_BUNDLE_PATH, 'rb') as f:
+                    _cutoff_bundle['page'] = PrecompressedPage(f.read(), 'application/octet-stream', max_age=0)
+                _cutoff_bundle['mtime'] = mtime
+    return _cutoff_bundle['page']
+
+@app.route('/api/cutoff-bundle')
+def cutoff_bundle():
+    try:
+        return get_cutoff_bundle().response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predictions/<path:filename>')
+def prediction_shard(filename):
+    path = safe_join(PREDICTIONS_DIR, filename)
+    if not path or not os.path.isfile(path):
+        return jsonify({'error': 'Prediction shard not found'}), 404
+    # Shards are requested with their hash in the query string, so they never change under a URL
+    if filename == 'manifest.json':
+        response = send_from_directory(PREDICTIONS_DIR, filename, mimetype='application/json')
+        response.headers['Cache-Control'] = 'no-cache'
+    else:
+        response = send_from_directory(PREDICTIONS_DIR, filename, mimetype='application/octet-stream')
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/predict-mobile', methods=['POST'])
+@rate_limiter.limit('predict')
 def predict_mobile():
     try:
         data = request.get_json()
@@ -1141,113 +1499,329 @@ def predict_mobile():
         student_rank = int(data.get('rank', 0))
         category = data.get('category', '')
         preferences = data.get('preferences', {})
+        with_uncertainty = bool(data.get('uncertainty', False))
+        filters = data.get('filters', {})
         
         if not student_rank or not category:
             return jsonify({'success': False, 'error': 'Rank and category are required'}), 400
+        filter_error = CollegeBitsetIndex.filter_error(filters)
+        if filter_error:
+            return jsonify({'success': False, 'error': filter_error}), 400
         
         if predictor and hasattr(predictor, 'is_trained') and predictor.is_trained:
-            predictions = predictor.predict_with_intelligence(student_rank, category, preferences)
-            eligible_colleges = [p for p in predictions if p.get('admission_probability', 0) > 0.2][:20]
+            cache_key = json.dumps([student_rank, category, preferences, filters, with_uncertainty], sort_keys=True)
+            colleges, mode = predictions_in_flight.do(cache_key, lambda: admitted_prediction(
+                cache_key, student_rank, category, preferences, with_uncertainty, filters))
         else:
             # Fallback basic search
-            eligible_colleges = basic_search(student_rank, category, preferences)
+            colleges = serialize(basic_search(student_rank, category, preferences))
+            mode = 'fallback'
         
         return jsonify({
             'success': True,
             'student_rank': student_rank,
             'category': category,
-            'total_colleges': len(eligible_colleges),
-            'colleges': eligible_colleges
+            'mode': mode,
+            'total_colleges': len(colleges),
+            'colleges': colleges
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+MAX_SWEEP_STEPS = 41
+
+@app.route('/api/predict-sweep', methods=['POST'])
+@rate_limiter.limit('predict')
+def predict_sweep():
+    """What-if sweep: how eligibility and probabilities change from start_rank to end_rank"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data received'}), 400
+        
+        category = data.get('category', '')
+        start_rank = int(data.get('start_rank', 0))
+        end_rank = int(data.get('end_rank', 0))
+        step = int(data.get('step', 100))
+        if not category or start_rank < 1 or end_rank < 1 or step < 1:
+            return jsonify({'success': False, 'error': 'category, start_rank, end_rank and a positive step are required'}), 400
+        
+        ranks = list(range(start_rank, end_rank + 1, step) if start_rank <= end_rank
+                     else range(start_rank, end_rank - 1, -step))
+        if len(ranks) > MAX_SWEEP_STEPS:
+            return jsonify({'success': False, 'error': f'At most {MAX_SWEEP_STEPS} steps per sweep'}), 400
+        filters = data.get('filters', {})
+        filter_error = CollegeBitsetIndex.filter_error(filters)
+        if filter_error:
+            return jsonify({'success': False, 'error': filter_error}), 400
+        if not (predictor and hasattr(predictor, 'is_trained') and predictor.is_trained):
+            return jsonify({'success': False, 'error': 'Prediction model is still loading, please retry shortly'}), 503
+        
+        # Under overload the closed-form engine answers instead of the ensembles
+        admitted = admission.try_acquire()
+        started = time.perf_counter()
+        try:
+            steps = predictor.predict_sweep(
+                ranks, category, data.get('preferences', {}), None if admitted else 'analytic',
+                min_probability=0.2, filters=filters)
+        finally:
+            if admitted:
+                admission.release(time.perf_counter() - started)
+        
+        return jsonify({
+            'success': True,
+            'category': category,
+            'mode': 'ml' if admitted else 'degraded',
+            'ranks': ranks,
+            'steps': steps
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/predict-compare', methods=['POST'])
+@rate_limiter.limit('predict')
+def predict_compare():
+    """Best option per college across every category the student qualifies under"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data received'}), 400
+        
+        student_rank = int(data.get('rank', 0))
+        categories = data.get('categories', [])
+        if not student_rank or not categories or not isinstance(categories, list):
+            return jsonify({'success': False, 'error': 'Rank and a list of categories are required'}), 400
+        unknown = [category for category in categories if category not in CATEGORIES]
+        if unknown:
+            return jsonify({'success': False, 'error': f'Unknown categories: {", ".join(map(str, unknown))}'}), 400
+        filters = data.get('filters', {})
+        filter_error = CollegeBitsetIndex.filter_error(filters)
+        if filter_error:
+            return jsonify({'success': False, 'error': filter_error}), 400
+        if not (predictor and hasattr(predictor, 'is_trained') and predictor.is_trained):
+            return jsonify({'success': False, 'error': 'Prediction model is still loading, please retry shortly'}), 503
+        
+        # Under overload the closed-form engine answers instead of the ensembles
+        admitted = admission.try_acquire()
+        started = time.perf_counter()
+        try:
+            colleges = predictor.predict_across_categories(
+                student_rank, categories, data.get('preferences', {}), None if admitted else 'analytic',
+                top_k=20, min_probability=0.2, filters=filters)
+        finally:
+            if admitted:
+                admission.release(time.perf_counter() - started)
+        
+        return jsonify({
+            'success': True,
+            'student_rank': student_rank,
+            'categories': categories,
+            'mode': 'ml' if admitted else 'degraded',
+            'total_colleges': len(colleges),
+            'colleges': serialize(colleges)
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def admitted_prediction(cache_key, student_rank, category, preferences, with_uncertainty, filters):
+    """(serialized colleges, mode): ML scoring if admitted, else a cached answer or basic_search"""
+    if not admission.try_acquire():
+        colleges = recent_predictions.get(cache_key)
+        if colleges is None:
+            colleges = serialize(basic_search(student_rank, category, preferences))
+        return colleges, 'degraded'
+    
+    started = time.perf_counter()
+    try:
+        colleges = serialize(predictor.predict_with_intelligence(
+            student_rank, category, preferences, top_k=20, min_probability=0.2,
+            with_uncertainty=with_uncertainty, filters=filters))
+    finally:
+        admission.release(time.perf_counter() - started)
+    recent_predictions.put(cache_key, colleges)
+    return colleges, 'ml'
+
 def basic_search(student_rank, category, preferences):
     """Fallback search when ML model is not available"""
     try:
-        with open('combined_pgcet_data.json', 'r') as f:
-            colleges = json.load(f)
-        
-        eligible = []
-        for college in colleges:
-            cutoffs = college.get('cutoffs', {})
-            if category in cutoffs and cutoffs[category] is not None:
-                cutoff = int(cutoffs[category]) if str(cutoffs[category]).isdigit() else None
-                if cutoff and student_rank <= cutoff:
-                    eligible.append({
-                        'college_code': college.get('collegeCode', ''),
-                        'college_name': college.get('collegeName', ''),
-                        'location': college.get('location', ''),
-                        'city': college.get('city', college.get('location', '').split(',')[-1].strip()),
-                        'cutoff_rank': cutoff,
-                        'best_round': 'First Round',
-                        'admission_probability': 0.8,
-                        'safety_level': 'Eligible',
-                        'rank_difference': cutoff - student_rank,
-                        'preference_match': False
-                    })
+        store = get_cutoff_store().snapshot()
+        c = store.category_index.get(category)
+        if c is None:
+            return []
         
-        # Sort by cutoff rank
-        eligible.sort(key=lambda x: x['cutoff_rank'])
-        return eligible[:20]
+        # Primary cutoffs straight from the shared mapping; best 20 by cutoff rank
+        cutoffs = store.primary[:, c]
+        eligible = np.flatnonzero((cutoffs > 0) & (cutoffs >= student_rank))
+        best = eligible[np.argsort(cutoffs[eligible], kind='stable')[:20]]
+        
+        return [CollegePrediction(
+            college_code=store.college_field(i, 'college_code'),
+            college_name=store.college_field(i, 'college_name'),
+            location=store.college_field(i, 'location'),
+            city=store.college_field(i, 'city'),
+            cutoff_rank=int(cutoffs[i]),
+            best_round='First Round',
+            admission_probability=0.8,
+            safety_level='Eligible',
+            rank_difference=int(cutoffs[i]) - student_rank,
+            preference_match=False
+        ) for i in best]
     except Exception as e:
-        print(f"Basic search error: {e}")
+        logger.exception("Basic search error: %s", e)
         return []
 
+# College records by code and the search index, rebuilt only on refresh
+_college_catalog = None
+_college_catalog_lock = threading.Lock()
+
+def get_college_catalog():
+    """Colleges by code and the search index, rebuilt when the shared cutoff store changes.
+
+    Keyed on the store version rather than cleared on refresh, so workers
+    that did not handle /api/refresh-data pick up new data too, and bodies
+    always match the data_version() ETag they are served with.
+    """
+    global _college_catalog
+    version = data_version()
+    catalog = _college_catalog
+    if catalog is None or catalog['version'] != version:
+        with _college_catalog_lock:
+            if _college_catalog is None or _college_catalog['version'] != version:
+                with open('combined_pgcet_data.json', 'r') as f:
+                    colleges = load_college_records(json.load(f))
+                _college_catalog = {
+                    'version': version,
+                    'by_code': {college.college_code: college for college in colleges},
+                    'search': CollegeSearchIndex(colleges)
+                }
+            catalog = _college_catalog
+    return catalog
+
+def invalidate_college_catalog():
+    global _college_catalog
+    _college_catalog = None
+
 @app.route('/api/college/<college_code>')
 def get_college_details(college_code):
     try:
-        with open('combined_pgcet_data.json', 'r') as f:
-            colleges = json.load(f)
-        
-        college = next((c for c in colleges if c.get('collegeCode') == college_code), None)
+        etag = f'{data_version()}-{college_code}'
+        cached = not_modified(etag, COLLEGE_CACHE_CONTROL)
+        if cached:
+            return cached
+        college = get_college_catalog()['by_code'].get(college_code)
         if college:
-            return jsonify(college)
+            return conditional_json(jsonify(college.to_dict()), etag, COLLEGE_CACHE_CONTROL)
         else:
             return jsonify({'error': 'College not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/colleges/search')
+def search_colleges():
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Query parameter q is required'}), 400
+        limit = request.args.get('limit', '10').strip()
+        if not limit.isdigit():
+            return jsonify({'success': False, 'error': 'limit must be a positive integer'}), 400
+        limit = max(1, min(int(limit), 50))
+        
+        started = time.perf_counter()
+        matches = get_college_catalog()['search'].search(query, limit)
+        took_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'took_ms': round(took_ms, 3),
+            'results': [{
+                'college_code': college.college_code,
+                'college_name': college.college_name,
+                'location': college.location,
+                'city': college.display_city,
+                'score': score
+            } for score, college in matches]
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/data-status')
 def get_data_status():
     try:
         if os.path.exists('combined_pgcet_data.json'):
             mod_time = os.path.getmtime('combined_pgcet_data.json')
             last_updated = datetime.fromtimestamp(mod_time).strftime('%Y-%m-%d %H:%M')
-            
-            with open('combined_pgcet_data.json', 'r') as f:
-                colleges = json.load(f)
-                total_colleges = len(colleges)
+            total_colleges = get_cutoff_store().size
         else:
             last_updated = 'File not found'
             total_colleges = 0
         
-        return jsonify({
+        # Model status and startup timings change too, so the ETag hashes the whole body
+        return conditional_json(jsonify({
             'success': True,
             'last_updated': last_updated,
             'total_colleges': total_colleges,
-            'model_status': 'Active' if predictor and hasattr(predictor, 'is_trained') and predictor.is_trained else 'Fallback Mode'
-        })
+            'data_version': data_version() if total_colleges else None,
+            'model_status': 'Active' if predictor and hasattr(predictor, 'is_trained') and predictor.is_trained else 'Fallback Mode',
+            'startup': startup_stats,
+            'drift': getattr(predictor, 'drift', None),
+            'scoring': {
+                'serving': SCORING_ENGINE,
+                'engines': {name: engine.description for name, engine in SCORING_REGISTRY.items()},
+                'shadow': shadow_scoring.stats() if shadow_scoring else None
+            },
+            'admission': admission.stats(),
+            'rate_limits': rate_limiter.stats(),
+            'single_flight': predictions_in_flight.stats(),
+            'refreshes': dict(refresh_counts),
+            'predictions': live_prediction_hashes()
+        }))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Concurrent refreshes share one reload: a request waits for the reload that
+# starts after it arrived, and skips its own if another request ran that one
+_refresh_lock = threading.Lock()
+refresh_counts = {'started': 0, 'completed': 0, 'coalesced': 0}
+
+def reload_data():
+    global predictor
+    target = refresh_counts['started'] + 1
+    with _refresh_lock:
+        if refresh_counts['completed'] >= target:
+            refresh_counts['coalesced'] += 1
+            return False
+        refresh_counts['started'] += 1
+        try:
+            invalidate_college_catalog()
+            recent_predictions.clear()
+            # Rebuild and rename the shared store; other workers remap on their next request
+            CutoffStore.build('combined_pgcet_data.json', CUTOFF_STORE_PATH, force=True)
+            get_cutoff_store().remap_if_changed(force=True)
+            build_bundle('combined_pgcet_data.json', CUTOFF_BUNDLE_PATH, force=True)
+            try:
+                predictor = load_model_artifact(model_store.fetch())
+                logger.info("✅ ML models reloaded successfully")
+            except Exception as e:
+                logger.warning("⚠️ Could not reload ML model: %s", e)
+        finally:
+            refresh_counts['completed'] = refresh_counts['started']
+        return True
+
 @app.route('/api/refresh-data', methods=['POST'])
+@rate_limiter.limit('refresh')
 def refresh_data():
     try:
-        global predictor
-        
         if os.path.exists('combined_pgcet_data.json'):
-            try:
-                from advanced_ml_predictor import AdvancedPGCETPredictor
-                predictor = AdvancedPGCETPredictor.load_models('advanced_pgcet_model.pkl', 'combined_pgcet_data.json')
-                print("✅ ML models reloaded successfully")
-            except Exception as e:
-                print(f"⚠️ Could not reload ML model: {e}")
+            reloaded = reload_data()
             
             return jsonify({
                 'success': True,
-                'message': 'Data refreshed successfully',
+                'message': 'Data refreshed successfully' if reloaded else 'Data refreshed by a concurrent request',
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             })
         else:
@@ -1265,14 +1839,14 @@ def not_found(error):
     if request.path.startswith('/api/'):
         return jsonify({'error': 'API endpoint not found'}), 404
     else:
-        return render_template_string(MOBILE_HTML)
+        return MOBILE_PAGE.response()
 
 @app.errorhandler(500)
 def internal_error(error):
     if request.path.startswith('/api/'):
         return jsonify({'error': 'Internal server error'}), 500
     else:
-        return render_template_string(MOBILE_HTML)
+        return MOBILE_PAGE.response()
 
 if __name__ == '__main__':
     print("📱 Mobile PGCET Cutoff Finder Starting...")
@@ -1,289 +1,597 @@
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor, RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, mean_absolute_error
-import joblib
 import json
+import os
+import threading
+import time
+
+from analytic_scoring import AnalyticAdmissionModel
+from college_index import CollegeBitsetIndex
+from college_database import CollegeDatabase, is_database_file
+from cutoff_store import pack_cutoffs, pack_primary
+from uncertainty import CutoffUncertainty
+from pgcet_records import (FEATURE_FIELDS, CollegeFeatures, CollegePrediction, RoundCutoffs, college_features,
+                           feature_matrix, load_college_records, serialize)
+from scoring_registry import SCORING_REGISTRY
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Serving only needs numpy; pandas and sklearn training code live in
+# advanced_ml_trainer and are imported on first use.
+FEATURE_COLUMNS = [
+    'student_rank', 'category_encoded', 'college_encoded', 'cutoff_rank',
+    'is_bangalore', 'is_mysore', 'is_hubli', 'is_mangalore', 'is_tier1_city',
+    'is_university', 'is_institute_tech', 'is_college', 'is_government',
+    'min_cutoff', 'avg_cutoff', 'cutoff_range', 'total_categories_available',
+    'has_multiple_rounds', 'rounds_count'
+]
+
+SCORING_ENGINES = tuple(SCORING_REGISTRY)
+
+# Entries load_models needs from a saved model
+MODEL_KEYS = ('admission_model', 'probability_model', 'category_encoder', 'college_encoder', 'scaler')
+
+# Marks "no usable cutoff" in eligible_cutoffs
+_NO_CUTOFF = np.iinfo(np.int32).max
 
 
 class AdvancedPGCETPredictor:
-    def __init__(self, data_file='combined_pgcet_data.json'):
+    def __init__(self, data_file='combined_pgcet_data.json', scoring_engine='ensemble', cutoff_store=None):
+        if scoring_engine not in SCORING_ENGINES:
+            raise ValueError(f"Unknown scoring engine {scoring_engine!r}, expected one of {SCORING_ENGINES}")
+        
         self.data_file = data_file
-        self.colleges_data = self.load_data()
+        self.scoring_engine = scoring_engine
+        self.cutoff_store = cutoff_store
+        self.mapping = None
+        self.database = None
+        if cutoff_store is not None:
+            # Serving: colleges, features and cutoffs are views into the shared store,
+            # which must be built from data_file; workers keep no records of their own
+            self.mapping = cutoff_store.snapshot()
+            self.colleges_data = self.mapping.colleges()
+            self.college_codes = self.mapping.college_codes()
+            self.feature_matrix = self.mapping.features
+        elif is_database_file(data_file) and os.path.exists(data_file):
+            # SQLite: one summary per college and packed arrays instead of records;
+            # eligible_cutoffs runs as an indexed range query against the file
+            self.database = CollegeDatabase(data_file)
+            self.colleges_data = self.database.load_summaries()
+            self.college_codes = [college.college_code for college in self.colleges_data]
+            self.feature_matrix = None
+        else:
+            self.colleges_data = self.load_data()
+            self.college_codes = [college.college_code for college in self.colleges_data]
+            self.feature_matrix = feature_matrix([self.extract_enhanced_features(college)
+                                                  for college in self.colleges_data])
+        self.build_cutoff_tensor()
         
-        # Models
-        self.admission_model = RandomForestClassifier(n_estimators=200, random_state=42)
-        self.probability_model = GradientBoostingRegressor(n_estimators=150, random_state=42)
-        self.cutoff_trend_model = RandomForestRegressor(n_estimators=100, random_state=42)
+        # Models (built by train_models or restored by load_models)
+        self.admission_model = None
+        self.probability_model = None
+        self.cutoff_trend_model = None
         
         # Encoders
-        self.category_encoder = LabelEncoder()
-        self.college_encoder = LabelEncoder()
-        self.city_encoder = LabelEncoder()
-        self.scaler = StandardScaler()
+        self.category_encoder = None
+        self.college_encoder = None
+        self.city_encoder = None
+        self.scaler = None
+        self.encoded_colleges = None
+        self.category_codes = None
+        self.drift = None
+        # Optional ShadowEvaluator fed by score()
+        self.shadow = None
+        self.model_file = None
         
+        self.analytic_model = AnalyticAdmissionModel()
+        self.uncertainty = None
         self.is_trained = False
         
     def load_data(self):
         try:
+            if is_database_file(self.data_file):
+                return CollegeDatabase(self.data_file).load_records()
             with open(self.data_file, 'r') as f:
-                return json.load(f)
+                return load_college_records(json.load(f))
         except FileNotFoundError:
-            print(f"❌ Error: {self.data_file} not found!")
-            print("Please run multi_pdf_extractor.py first to create the combined data file.")
+            logger.error("❌ Error: %s not found! Please run multi_pdf_extractor.py first "
+                         "to create the combined data file.", self.data_file)
             return []
     
+    def records(self):
+        """CollegeRecords for training and saving, read from data_file unless they are already loaded"""
+        if self.mapping is None and self.database is None:
+            return self.colleges_data
+        return self.load_data()
+    
     def extract_enhanced_features(self, college):
         """Extract comprehensive features from college data"""
-        location = college.get('location', '').upper()
-        name = college.get('collegeName', '').upper()
-        
-        # Get cutoffs from all rounds
-        all_cutoffs = []
-        for round_data in college.get('rounds', {}).values():
-            all_cutoffs.extend([v for v in round_data.values() if v is not None and str(v).isdigit()])
-        
-        # If no round data, use primary cutoffs
-        if not all_cutoffs:
-            all_cutoffs = [v for v in college.get('cutoffs', {}).values() if v is not None and str(v).isdigit()]
-        
-        all_cutoffs = [int(c) for c in all_cutoffs]
-        
-        features = {
-            # Location features
-            'is_bangalore': 1 if 'BANGALORE' in location else 0,
-            'is_mysore': 1 if 'MYSORE' in location else 0,
-            'is_hubli': 1 if 'HUBLI' in location else 0,
-            'is_mangalore': 1 if 'MANGALORE' in location else 0,
-            'is_tier1_city': 1 if any(city in location for city in ['BANGALORE', 'MYSORE', 'HUBLI', 'MANGALORE']) else 0,
-            
-            # Institution type
-            'is_university': 1 if 'UNIVERSITY' in name else 0,
-            'is_institute_tech': 1 if any(word in name for word in ['INSTITUTE OF TECHNOLOGY', 'ENGINEERING', 'TECHNICAL']) else 0,
-            'is_college': 1 if 'COLLEGE' in name else 0,
-            
-            # Prestige indicators
-            'is_government': 1 if any(word in name for word in ['UNIVERSITY', 'GOVERNMENT', 'GOVT']) else 0,
-            'is_autonomous': 1 if 'AUTONOMOUS' in name else 0,
-            
-            # Cutoff-based features
-            'min_cutoff': min(all_cutoffs) if all_cutoffs else 8000,
-            'max_cutoff': max(all_cutoffs) if all_cutoffs else 12000,
-            'avg_cutoff': np.mean(all_cutoffs) if all_cutoffs else 10000,
-            'cutoff_range': max(all_cutoffs) - min(all_cutoffs) if len(all_cutoffs) > 1 else 0,
-            'total_categories_available': len(all_cutoffs),
-            
-            # Round availability
-            'has_multiple_rounds': len(college.get('rounds', {})) > 1,
-            'rounds_count': len(college.get('rounds', {}))
+        return college_features(college)
+    
+    def build_cutoff_tensor(self):
+        """Pack all cutoffs into one (college, round, category) int32 array"""
+        if self.mapping is not None:
+            # Read-only views into the shared memory-mapped store instead of private copies
+            self.round_names = list(self.mapping.round_names)
+            self.category_names = list(self.mapping.category_names)
+            self.cutoff_tensor = self.mapping.tensor
+            self.primary_cutoffs = self.mapping.primary
+        elif self.database is not None:
+            (self.round_names, self.category_names, self.cutoff_tensor, self.primary_cutoffs,
+             self.feature_matrix) = self.database.pack_serving(self.colleges_data)
+        else:
+            # 0 marks a missing cutoff
+            self.round_names, self.category_names, self.cutoff_tensor = pack_cutoffs(self.colleges_data)
+            self.primary_cutoffs = pack_primary(self.colleges_data, self.category_names)
+        self.category_index = {category: i for i, category in enumerate(self.category_names)}
+        self.round_index = {round_name: i for i, round_name in enumerate(self.round_names)}
+        
+        # Per-college model inputs that do not depend on the request
+        self.static_features = self.feature_matrix[:, [FEATURE_FIELDS.index(column) for column in FEATURE_COLUMNS[4:]]]
+        
+        # City / institution / category bitsets for filters and preferences
+        self.college_index = CollegeBitsetIndex(
+            self.colleges_data, self.feature_matrix, self.cutoff_tensor, self.category_names)
+    
+    def college_features(self, i):
+        """CollegeFeatures of college i"""
+        return CollegeFeatures.from_row(self.feature_matrix[i])
+    
+    def prepare_serving(self, training_colleges=None, warm_uncertainty=True):
+        """Encode college codes and categories once after the encoders are fitted or loaded.
+        
+        Codes and categories the encoders have never seen are found here,
+        once, and scored with the analytic curve instead of the ensembles.
+        With warm_uncertainty the interval bands are simulated on a
+        background thread, so with_uncertainty requests find them cached.
+        """
+        known = set(self.college_encoder.classes_)
+        codes = self.college_codes
+        self.encoded_colleges = np.full(len(codes), -1, dtype=np.int64)
+        seen = [i for i, code in enumerate(codes) if code in known]
+        if seen:
+            self.encoded_colleges[seen] = self.college_encoder.transform([codes[i] for i in seen])
+        self.category_codes = {label: i for i, label in enumerate(self.category_encoder.classes_)}
+        self.drift = self.check_drift(training_colleges)
+        
+        if self.drift['unseen_colleges'] or self.drift['unseen_categories']:
+            logger.warning("⚠️ %d colleges and %d categories are unknown to the model; scoring them with the analytic curve",
+                           len(self.drift['unseen_colleges']), len(self.drift['unseen_categories']),
+                           extra={'unseen_colleges': self.drift['unseen_colleges'],
+                                  'unseen_categories': self.drift['unseen_categories']})
+        
+        if warm_uncertainty:
+            if self.uncertainty is None:
+                self.uncertainty = CutoffUncertainty(self)
+            threading.Thread(target=self.uncertainty.warm, name='uncertainty-warm', daemon=True).start()
+    
+    def check_drift(self, training_colleges=None):
+        """How far the serving data has moved from what the model was trained on"""
+        # Colleges without any cutoff are never scored, so they cannot drift
+        codes = {code for i, code in enumerate(self.college_codes) if self.cutoff_tensor[i].any()}
+        known_codes = set(self.college_encoder.classes_)
+        served_categories = {category for i, category in enumerate(self.category_names)
+                             if self.cutoff_tensor[:, :, i].any()}
+        drift = {
+            'serving_colleges': len(codes),
+            'model_colleges': len(known_codes),
+            'unseen_colleges': sorted(codes - known_codes),
+            'retired_colleges': len(known_codes - codes),
+            'unseen_categories': sorted(served_categories - self.category_codes.keys()),
+            'cutoff_drift': None
         }
         
-        return features
+        if self.model_file and os.path.exists(self.model_file) and os.path.exists(self.data_file):
+            model_time, data_time = os.path.getmtime(self.model_file), os.path.getmtime(self.data_file)
+            drift['model_saved_at'] = time.strftime('%Y-%m-%d %H:%M', time.localtime(model_time))
+            drift['data_modified_at'] = time.strftime('%Y-%m-%d %H:%M', time.localtime(data_time))
+            drift['data_newer_than_model'] = data_time > model_time
+        
+        # Primary cutoffs of colleges present both in training and serving data
+        if training_colleges:
+            # The saved colleges are only read here, as dicts, and dropped with the pickle
+            trained = {college['collegeCode']: RoundCutoffs.from_dict('Primary', college.get('cutoffs', {}))
+                       for college in training_colleges}
+            changes = []
+            changed_colleges = 0
+            for i, code in enumerate(self.college_codes):
+                before = trained.get(code)
+                if before is None:
+                    continue
+                pairs = [(before.get(category), cutoff)
+                         for category, cutoff in zip(self.category_names, self.primary_cutoffs[i].tolist())
+                         if cutoff and before.get(category)]
+                changes.extend(abs(cutoff - old) / old for old, cutoff in pairs)
+                changed_colleges += any(old != cutoff for old, cutoff in pairs)
+            drift['cutoff_drift'] = {
+                'compared_cells': len(changes),
+                'changed_cells': sum(1 for change in changes if change),
+                'changed_colleges': changed_colleges,
+                'median_relative_change': round(float(np.median(changes)), 4) if changes else 0.0,
+                'max_relative_change': round(float(max(changes)), 4) if changes else 0.0
+            }
+        return drift
     
-    def create_comprehensive_training_data(self):
-        """Create comprehensive training dataset"""
-        training_samples = []
+    def eligible_cutoffs(self, student_rank, category, candidates=None):
+        """Lowest cutoff at or above the rank for every college, vectorized.
         
-        if not self.colleges_data:
-            print("❌ No college data available for training!")
-            return pd.DataFrame()
+        Returns (college indices, best cutoffs, round indices) for the
+        colleges the rank is eligible for in any round. candidates limits
+        the scan to an array of college indices.
+        """
+        c = self.category_index.get(category)
+        if c is None:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+        if self.database is not None:
+            return self.eligible_from_database(student_rank, category, candidates)
         
-        for college in self.colleges_data:
-            college_features = self.extract_enhanced_features(college)
-            
-            # Process all rounds or primary cutoffs
-            rounds_to_process = college.get('rounds', {})
-            if not rounds_to_process:
-                # Use primary cutoffs if no rounds data
-                rounds_to_process = {'Primary': college.get('cutoffs', {})}
-            
-            for round_name, round_cutoffs in rounds_to_process.items():
-                for category, cutoff in round_cutoffs.items():
-                    if cutoff is not None and str(cutoff).isdigit():
-                        cutoff = int(cutoff)
-                        
-                        # Generate positive samples (admitted students)
-                        for rank in range(2001, cutoff + 1, 120):
-                            sample = {
-                                'student_rank': rank,
-                                'category': category,
-                                'college_code': college['collegeCode'],
-                                'round': round_name,
-                                'cutoff_rank': cutoff,
-                                'gets_admission': 1,
-                                'admission_probability': min(0.95, 0.6 + (cutoff - rank) / cutoff * 0.35),
-                                **college_features
-                            }
-                            training_samples.append(sample)
-                        
-                        # Generate negative samples (not admitted)
-                        for rank in range(cutoff + 50, min(cutoff + 1800, 11000), 180):
-                            sample = {
-                                'student_rank': rank,
-                                'category': category,
-                                'college_code': college['collegeCode'],
-                                'round': round_name,
-                                'cutoff_rank': cutoff,
-                                'gets_admission': 0,
-                                'admission_probability': max(0.05, 0.4 - (rank - cutoff) / cutoff * 0.35),
-                                **college_features
-                            }
-                            training_samples.append(sample)
-        
-        return pd.DataFrame(training_samples)
+        cutoffs = self.cutoff_tensor[:, :, c] if candidates is None else self.cutoff_tensor[candidates, :, c]
+        usable = np.where((cutoffs > 0) & (cutoffs >= student_rank), cutoffs, _NO_CUTOFF)
+        best_round = usable.argmin(axis=1)
+        best = usable[np.arange(len(usable)), best_round]
+        rows = np.flatnonzero(best != _NO_CUTOFF)
+        college_idx = rows if candidates is None else np.asarray(candidates)[rows]
+        return college_idx, best[rows], best_round[rows]
     
-    def train_models(self):
-        """Train all ML models"""
-        print("🤖 Creating comprehensive training dataset...")
-        training_data = self.create_comprehensive_training_data()
-        
-        if training_data.empty:
-            print("❌ No training data available!")
-            return 0, 0
-        
-        print(f"📊 Generated {len(training_data)} training samples")
-        
-        # Encode categorical variables
-        training_data['category_encoded'] = self.category_encoder.fit_transform(training_data['category'])
-        training_data['college_encoded'] = self.college_encoder.fit_transform(training_data['college_code'])
-        
-        # Prepare features
-        feature_columns = [
-            'student_rank', 'category_encoded', 'college_encoded', 'cutoff_rank',
-            'is_bangalore', 'is_mysore', 'is_hubli', 'is_mangalore', 'is_tier1_city',
-            'is_university', 'is_institute_tech', 'is_college', 'is_government',
-            'min_cutoff', 'avg_cutoff', 'cutoff_range', 'total_categories_available',
-            'has_multiple_rounds', 'rounds_count'
-        ]
-        
-        X = training_data[feature_columns]
-        y_admission = training_data['gets_admission']
-        y_probability = training_data['admission_probability']
-        
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Split data
-        X_train, X_test, y_adm_train, y_adm_test, y_prob_train, y_prob_test = train_test_split(
-            X_scaled, y_admission, y_probability, test_size=0.2, random_state=42
-        )
+    def eligible_from_database(self, student_rank, category, candidates=None):
+        """eligible_cutoffs answered by a (category, round, cutoff) range query on the database"""
+        rows = self.database.eligible_rows(student_rank, category, self.round_names)
+        college_idx = np.array([row[0] for row in rows], dtype=np.int64)
+        rounds = np.array([self.round_index[row[1]] for row in rows], dtype=np.int64)
+        cutoffs = np.array([row[2] for row in rows], dtype=np.int64)
+        if candidates is not None:
+            keep = np.isin(college_idx, candidates)
+            college_idx, rounds, cutoffs = college_idx[keep], rounds[keep], cutoffs[keep]
+        
+        # Lowest cutoff per college, earliest round on ties, like argmin over the tensor
+        order = np.lexsort((rounds, cutoffs, college_idx))
+        college_idx, rounds, cutoffs = college_idx[order], rounds[order], cutoffs[order]
+        first = np.unique(college_idx, return_index=True)[1]
+        return college_idx[first], cutoffs[first], rounds[first]
+    
+    def ensemble_probabilities(self, student_rank, category, college_idx, cutoffs, fallback=True,
+                               components=('admission', 'probability')):
+        """Score many colleges with the ensembles in one batched call.
+        
+        student_rank and category may be scalars or one value per college.
+        Rows whose college or category the encoders do not know are scored
+        with the analytic curve, or left NaN when fallback is False.
+        components picks which of the two models are averaged.
+        """
+        if self.encoded_colleges is None:
+            self.prepare_serving()
+        probabilities = np.full(len(college_idx), np.nan)
+        if np.ndim(category) == 0:
+            category_encoded = np.full(len(college_idx), self.category_codes.get(category, -1), dtype=float)
+        else:
+            category_encoded = np.array([self.category_codes.get(label, -1) for label in category], dtype=float)
+        encoded = self.encoded_colleges[college_idx]
+        keep = (encoded >= 0) & (category_encoded >= 0)
         
-        # Train admission classifier
-        print("🎯 Training admission prediction model...")
-        self.admission_model.fit(X_train, y_adm_train)
-        adm_accuracy = accuracy_score(y_adm_test, self.admission_model.predict(X_test))
+        if fallback and not keep.all():
+            unknown = ~keep
+            probabilities[unknown] = SCORING_REGISTRY['analytic'].score(
+                self,
+                np.broadcast_to(np.asarray(student_rank), len(college_idx))[unknown],
+                category if np.ndim(category) == 0 else np.asarray(category)[unknown],
+                college_idx[unknown], np.asarray(cutoffs)[unknown])
+        if not keep.any():
+            return probabilities
         
-        # Train probability regressor
-        print("📈 Training probability prediction model...")
-        self.probability_model.fit(X_train, y_prob_train)
-        prob_mae = mean_absolute_error(y_prob_test, self.probability_model.predict(X_test))
+        features = np.column_stack([
+            np.broadcast_to(np.asarray(student_rank, dtype=float), len(college_idx))[keep],
+            category_encoded[keep],
+            encoded[keep],
+            np.asarray(cutoffs)[keep],
+            self.static_features[college_idx[keep]]
+        ])
+        features_scaled = self.scaler.transform(features)
         
-        print(f"✅ Admission Model Accuracy: {adm_accuracy:.3f}")
-        print(f"✅ Probability Model MAE: {prob_mae:.3f}")
+        scores = []
+        if 'admission' in components:
+            scores.append(self.admission_model.predict_proba(features_scaled)[:, 1])
+        if 'probability' in components:
+            scores.append(np.clip(self.probability_model.predict(features_scaled), 0, 1))
         
-        self.is_trained = True
-        return adm_accuracy, prob_mae
+        # Combine predictions
+        probabilities[keep] = np.mean(scores, axis=0)
+        return probabilities
     
-    def predict_with_intelligence(self, student_rank, category, preferences=None):
-        """Intelligent prediction with preferences"""
-        if not self.is_trained:
+    def create_comprehensive_training_data(self):
+        """Create comprehensive training dataset"""
+        from advanced_ml_trainer import PGCETModelTrainer
+        return PGCETModelTrainer(self).create_comprehensive_training_data()
+    
+    def train_models(self):
+        """Train all ML models"""
+        from advanced_ml_trainer import PGCETModelTrainer
+        return PGCETModelTrainer(self).train_models()
+    
+    def preference_bonus(self, college_idx, preferences):
+        """Preference bonus per college; it does not depend on the model score"""
+        index = self.college_index
+        bonus = np.zeros(len(college_idx))
+        if preferences.get('preferred_city'):
+            bonus += np.where(index.mask(index.city_bits(preferences['preferred_city']))[college_idx], 0.1, 0)
+        if preferences.get('prefer_government'):
+            bonus += np.where(index.mask(index.flag_bits['government'])[college_idx], 0.05, 0)
+        if preferences.get('prefer_university'):
+            bonus += np.where(index.mask(index.flag_bits['university'])[college_idx], 0.05, 0)
+        return bonus
+    
+    def score(self, engine, student_rank, category, college_idx, cutoffs):
+        """Model probability per college, NaN where the engine cannot score it.
+        
+        When a shadow evaluator is attached, calls with the serving engine
+        are offered to it after scoring; it samples and queues, never
+        scoring inline. Calls forcing another engine (shed load) are not.
+        """
+        started = time.perf_counter()
+        probabilities = SCORING_REGISTRY[engine].score(self, student_rank, category, college_idx, cutoffs)
+        if self.shadow is not None and engine == self.scoring_engine:
+            self.shadow.observe(self, engine, time.perf_counter() - started,
+                                student_rank, category, college_idx, cutoffs, probabilities)
+        return probabilities
+    
+    def resolve_engine(self, engine=None):
+        engine = engine or self.scoring_engine
+        if engine not in SCORING_ENGINES:
+            raise ValueError(f"Unknown scoring engine {engine!r}, expected one of {SCORING_ENGINES}")
+        if SCORING_REGISTRY[engine].needs_models and not self.is_trained:
             raise ValueError("Models not trained! Call train_models() first.")
+        return engine
+    
+    def filter_candidates(self, category, filters=None):
+        """College indices passing the hard filters, None when there are none"""
+        if not filters:
+            return None
+        index = self.college_index
+        return index.indices(index.filter_bits(filters) & index.category_bits.get(category, 0))
+    
+    def predict_with_intelligence(self, student_rank, category, preferences=None, engine=None,
+                                  top_k=None, min_probability=None, with_uncertainty=False, filters=None):
+        """Intelligent prediction with preferences
         
-        predictions = []
+        engine names a scoring_registry engine: 'ensemble' (the trained
+        models), 'regressor' (the probability model alone) or 'analytic'
+        (the closed-form curve, no trained models needed); it defaults to
+        the predictor's scoring_engine. top_k limits the result to the best K
+        colleges and min_probability drops colleges whose final probability
+        is not above it. with_uncertainty adds a Monte Carlo probability
+        interval to each prediction. filters are hard constraints such as
+        {'city': 'BANGALORE', 'government': True}, applied by intersecting
+        index bitsets before any scoring.
+        """
+        engine = self.resolve_engine(engine)
         preferences = preferences or {}
+        candidates = self.filter_candidates(category, filters)
         
-        for college in self.colleges_data:
-            # Check if college has data for this category
-            has_category = False
-            best_cutoff = None
-            best_round = None
-            
-            # Check all rounds for best cutoff
-            rounds_data = college.get('rounds', {})
-            if not rounds_data:
-                rounds_data = {'Primary': college.get('cutoffs', {})}
+        # Best cutoff across all rounds for every eligible college
+        college_idx, best_cutoffs, best_rounds = self.eligible_cutoffs(student_rank, category, candidates)
+        preference_bonus = self.preference_bonus(college_idx, preferences)
+        
+        # Results rank preference matches first, so when top_k is set the
+        # unmatched colleges only need scoring if the matched ones cannot
+        # fill the top K on their own.
+        matched = preference_bonus > 0
+        if top_k is not None and matched.any():
+            tiers = [matched, ~matched]
+        else:
+            tiers = [np.ones(len(college_idx), dtype=bool)]
+        
+        selected_idx, selected_probabilities = [], []
+        found = 0
+        for tier in tiers:
+            tier_idx = np.flatnonzero(tier)
+            probabilities = self.score(engine, student_rank, category, college_idx[tier_idx], best_cutoffs[tier_idx])
+            final_probabilities = np.minimum(0.98, probabilities + preference_bonus[tier_idx])
             
-            for round_name, round_cutoffs in rounds_data.items():
-                if category in round_cutoffs and round_cutoffs[category] is not None:
-                    cutoff = int(round_cutoffs[category]) if str(round_cutoffs[category]).isdigit() else None
-                    if cutoff and student_rank <= cutoff:
-                        if best_cutoff is None or cutoff < best_cutoff:
-                            best_cutoff = cutoff
-                            best_round = round_name
-                        has_category = True
+            keep = ~np.isnan(final_probabilities)
+            if min_probability is not None:
+                keep &= final_probabilities > min_probability
+            selected_idx.append(tier_idx[keep])
+            selected_probabilities.append(final_probabilities[keep])
             
-            if has_category and best_cutoff:
-                college_features = self.extract_enhanced_features(college)
-                
-                try:
-                    # Prepare features for prediction
-                    features = np.array([[
-                        student_rank,
-                        self.category_encoder.transform([category])[0],
-                        self.college_encoder.transform([college['collegeCode']])[0],
-                        best_cutoff,
-                        college_features['is_bangalore'],
-                        college_features['is_mysore'],
-                        college_features['is_hubli'],
-                        college_features['is_mangalore'],
-                        college_features['is_tier1_city'],
-                        college_features['is_university'],
-                        college_features['is_institute_tech'],
-                        college_features['is_college'],
-                        college_features['is_government'],
-                        college_features['min_cutoff'],
-                        college_features['avg_cutoff'],
-                        college_features['cutoff_range'],
-                        college_features['total_categories_available'],
-                        college_features['has_multiple_rounds'],
-                        college_features['rounds_count']
-                    ]])
-                    
-                    features_scaled = self.scaler.transform(features)
-                    
-                    # Get predictions
-                    admission_prob = self.admission_model.predict_proba(features_scaled)[0][1]
-                    probability_score = max(0, min(1, self.probability_model.predict(features_scaled)[0]))
-                    
-                    # Combine predictions
-                    final_probability = (admission_prob + probability_score) / 2
-                    
-                    # Apply preferences
-                    preference_bonus = 0
-                    if preferences.get('preferred_city') and preferences['preferred_city'].upper() in college.get('location', '').upper():
-                        preference_bonus += 0.1
-                    if preferences.get('prefer_government') and college_features['is_government']:
-                        preference_bonus += 0.05
-                    if preferences.get('prefer_university') and college_features['is_university']:
-                        preference_bonus += 0.05
-                    
-                    final_probability = min(0.98, final_probability + preference_bonus)
-                    
-                    predictions.append({
-                        'college_code': college['collegeCode'],
-                        'college_name': college['collegeName'],
-                        'location': college['location'],
-                        'city': college.get('city', college['location'].split(',')[-1].strip()),
-                        'cutoff_rank': best_cutoff,
-                        'best_round': best_round,
-                        'admission_probability': final_probability,
-                        'safety_level': self.calculate_safety_level(student_rank, best_cutoff),
-                        'rank_difference': best_cutoff - student_rank,
-                        'college_features': college_features,
-                        'preference_match': preference_bonus > 0
-                    })
-                    
-                except (ValueError, KeyError) as e:
-                    # Handle unseen categories/colleges
-                    print(f"⚠️ Skipping {college['collegeCode']}: {e}")
-                    continue
+            found += keep.sum()
+            if top_k is not None and found >= top_k:
+                break
+        
+        positions = np.concatenate(selected_idx)
+        final_probabilities = np.concatenate(selected_probabilities)
+        order = self.select_top(matched[positions], final_probabilities, college_idx[positions], top_k)
+        positions, final_probabilities = positions[order], final_probabilities[order]
+        
+        lows = highs = [None] * len(positions)
+        if with_uncertainty:
+            if self.uncertainty is None:
+                self.uncertainty = CutoffUncertainty(self)
+            lows, highs = self.uncertainty.intervals(
+                student_rank, category, college_idx[positions], final_probabilities)
+            lows, highs = lows.tolist(), highs.tolist()
+        
+        predictions = []
+        for position, probability, low, high in zip(
+                positions.tolist(), final_probabilities.tolist(), lows, highs):
+            i = college_idx[position]
+            cutoff = int(best_cutoffs[position])
+            college = self.colleges_data[i]
+            predictions.append(CollegePrediction(
+                college_code=college.college_code,
+                college_name=college.college_name,
+                location=college.location,
+                city=college.display_city,
+                cutoff_rank=cutoff,
+                best_round=self.round_names[best_rounds[position]],
+                admission_probability=probability,
+                safety_level=self.calculate_safety_level(student_rank, cutoff),
+                rank_difference=cutoff - student_rank,
+                preference_match=bool(matched[position]),
+                college_features=self.college_features(i),
+                probability_low=low,
+                probability_high=high
+            ))
+        return predictions
+    
+    def predict_across_categories(self, student_rank, categories, preferences=None, engine=None,
+                                  top_k=None, min_probability=None, filters=None):
+        """Best option per college over several categories the student qualifies under.
         
-        # Sort by preference match and probability
-        predictions.sort(key=lambda x: (x['preference_match'], x['admission_probability']), reverse=True)
+        Eligible (category, college) pairs from every category are scored in
+        one batched model call; each college keeps its most probable
+        category. Ordering, top_k and min_probability work as in
+        predict_with_intelligence, and each prediction names its category.
+        """
+        engine = self.resolve_engine(engine)
+        preferences = preferences or {}
+        categories = list(dict.fromkeys(categories))
+        
+        pair_categories, pair_idx, pair_cutoffs, pair_rounds = [], [], [], []
+        for category in categories:
+            college_idx, best_cutoffs, best_rounds = self.eligible_cutoffs(
+                student_rank, category, self.filter_candidates(category, filters))
+            pair_categories.append(np.full(len(college_idx), category, dtype=object))
+            pair_idx.append(college_idx)
+            pair_cutoffs.append(best_cutoffs)
+            pair_rounds.append(best_rounds)
+        pair_categories = np.concatenate(pair_categories) if categories else np.array([], dtype=object)
+        pair_idx = np.concatenate(pair_idx).astype(np.int64) if categories else np.array([], dtype=np.int64)
+        pair_cutoffs = np.concatenate(pair_cutoffs) if categories else np.array([], dtype=np.int64)
+        pair_rounds = np.concatenate(pair_rounds) if categories else np.array([], dtype=np.int64)
+        
+        probabilities = np.full(len(pair_idx), np.nan)
+        if len(pair_idx):
+            probabilities = self.score(engine, student_rank, pair_categories, pair_idx, pair_cutoffs)
+        preference_bonus = self.preference_bonus(pair_idx, preferences)
+        final_probabilities = np.minimum(0.98, probabilities + preference_bonus)
+        keep = ~np.isnan(final_probabilities)
+        if min_probability is not None:
+            keep &= np.nan_to_num(final_probabilities) > min_probability
+        pairs = np.flatnonzero(keep)
+        
+        # Most probable category per college; ties go to the category listed first
+        pairs = pairs[np.lexsort((pairs, -final_probabilities[pairs], pair_idx[pairs]))]
+        pairs = pairs[np.unique(pair_idx[pairs], return_index=True)[1]]
+        matched = preference_bonus[pairs] > 0
+        order = self.select_top(matched, final_probabilities[pairs], pair_idx[pairs], top_k)
+        
+        predictions = []
+        for pair, preference_match in zip(pairs[order].tolist(), matched[order].tolist()):
+            i = pair_idx[pair]
+            college = self.colleges_data[i]
+            cutoff = int(pair_cutoffs[pair])
+            predictions.append(CollegePrediction(
+                college_code=college.college_code,
+                college_name=college.college_name,
+                location=college.location,
+                city=college.display_city,
+                cutoff_rank=cutoff,
+                best_round=self.round_names[pair_rounds[pair]],
+                admission_probability=float(final_probabilities[pair]),
+                safety_level=self.calculate_safety_level(student_rank, cutoff),
+                rank_difference=cutoff - student_rank,
+                preference_match=preference_match,
+                college_features=self.college_features(i),
+                category=pair_categories[pair]
+            ))
         return predictions
     
+    def rank_grid(self, student_ranks, category, preferences=None, engine=None, filters=None):
+        """Final probabilities for every (rank, college) pair in one batched pass.
+        
+        Best cutoffs come from one broadcast over the cutoff tensor and all
+        eligible pairs are scored in a single model call. Returns (college
+        indices, best cutoffs, best rounds, probabilities); the last three
+        are (rank, college) arrays with NaN probability where ineligible.
+        """
+        engine = self.resolve_engine(engine)
+        ranks = np.asarray(student_ranks, dtype=np.int64)
+        candidates = self.filter_candidates(category, filters)
+        college_idx = np.arange(len(self.colleges_data)) if candidates is None else np.asarray(candidates, dtype=np.int64)
+        
+        c = self.category_index.get(category)
+        if c is None:
+            college_idx = college_idx[:0]
+        cutoffs = self.cutoff_tensor[college_idx, :, c or 0][None]
+        usable = np.where((cutoffs > 0) & (cutoffs >= ranks[:, None, None]), cutoffs, _NO_CUTOFF)
+        best_rounds = usable.argmin(axis=2)
+        best_cutoffs = np.take_along_axis(usable, best_rounds[..., None], axis=2)[..., 0]
+        
+        probabilities = np.full(best_cutoffs.shape, np.nan)
+        rank_pos, college_pos = np.nonzero(best_cutoffs != _NO_CUTOFF)
+        if len(rank_pos):
+            scores = self.score(engine, ranks[rank_pos], category,
+                                college_idx[college_pos], best_cutoffs[rank_pos, college_pos])
+            bonus = self.preference_bonus(college_idx, preferences or {})
+            probabilities[rank_pos, college_pos] = np.minimum(0.98, scores + bonus[college_pos])
+        return college_idx, best_cutoffs, best_rounds, probabilities
+    
+    def predict_sweep(self, student_ranks, category, preferences=None, engine=None,
+                      min_probability=None, filters=None, min_shift=0.01):
+        """How the eligible colleges change across hypothetical ranks.
+        
+        Uses rank_grid, so the whole sweep is one batched model call.
+        Returns one step per rank with the colleges that entered or left
+        eligibility since the previous rank (the first step lists all of
+        them) and the probabilities that moved by at least min_shift.
+        """
+        ranks = np.asarray(student_ranks, dtype=np.int64)
+        college_idx, best_cutoffs, best_rounds, probabilities = self.rank_grid(
+            ranks, category, preferences, engine, filters)
+        
+        member = ~np.isnan(probabilities)
+        if min_probability is not None:
+            member &= np.nan_to_num(probabilities) > min_probability
+        
+        steps = []
+        previous = np.zeros(len(college_idx), dtype=bool)
+        for r, student_rank in enumerate(ranks.tolist()):
+            current = member[r]
+            entered = np.flatnonzero(current & ~previous)
+            both = np.flatnonzero(current & previous)
+            change = probabilities[r, both] - probabilities[r - 1, both] if r else np.zeros(0)
+            shifted = np.argsort(-np.abs(change), kind='stable')
+            shifted = shifted[np.abs(change[shifted]) >= min_shift]
+            steps.append({
+                'rank': student_rank,
+                'eligible': int(current.sum()),
+                'entered': [{
+                    'college_code': self.college_codes[college_idx[p]],
+                    'cutoff_rank': int(best_cutoffs[r, p]),
+                    'best_round': self.round_names[best_rounds[r, p]],
+                    'admission_probability': float(probabilities[r, p])
+                } for p in entered.tolist()],
+                'left': [self.college_codes[college_idx[p]]
+                         for p in np.flatnonzero(previous & ~current).tolist()],
+                'shifts': [{
+                    'college_code': self.college_codes[college_idx[both[s]]],
+                    'admission_probability': float(probabilities[r, both[s]]),
+                    'change': round(float(change[s]), 4)
+                } for s in shifted.tolist()]
+            })
+            previous = current
+        return steps
+    
+    @staticmethod
+    def select_top(preference_match, probabilities, college_idx, top_k=None):
+        """Order by (preference match, probability) descending, ties by college order.
+        
+        With top_k only the K best are ordered: an O(n) partition finds the
+        K-th best key and just the candidates at or above it are sorted.
+        """
+        # Probabilities are capped at 0.98, so a match always outranks no match
+        keys = preference_match * 2.0 + probabilities
+        if top_k is not None and top_k < len(keys):
+            if top_k <= 0:
+                return np.array([], dtype=np.int64)
+            kth_best = np.partition(keys, len(keys) - top_k)[len(keys) - top_k]
+            candidates = np.flatnonzero(keys >= kth_best)
+        else:
+            candidates = np.arange(len(keys))
+        
+        order = candidates[np.lexsort((college_idx[candidates], -keys[candidates]))]
+        return order[:top_k] if top_k is not None else order
+    
     def calculate_safety_level(self, student_rank, cutoff_rank):
         difference = cutoff_rank - student_rank
         if difference > 1500: return 'Very Safe'
@@ -293,21 +601,35 @@ class AdvancedPGCETPredictor:
         else: return 'Reach'
     
     def save_models(self, filepath='advanced_pgcet_model.pkl'):
+        if self.mapping is not None:
+            raise ValueError("Save models from a predictor loaded from data_file; this one serves from a cutoff store")
         model_data = {
             'admission_model': self.admission_model,
             'probability_model': self.probability_model,
             'category_encoder': self.category_encoder,
             'college_encoder': self.college_encoder,
             'scaler': self.scaler,
-            'colleges_data': self.colleges_data
+            'colleges_data': serialize(self.records()),
+            'analytic_coefficients': self.analytic_model.coefficients
         }
+        import joblib
         joblib.dump(model_data, filepath)
-        print(f"🎯 Models saved to {filepath}")
+        logger.info("🎯 Models saved to %s", filepath)
+    
+    @staticmethod
+    def check_model_file(filepath):
+        """Raise unless filepath holds a model saved by save_models"""
+        import joblib
+        model_data = joblib.load(filepath)
+        missing = [key for key in MODEL_KEYS if key not in model_data] if isinstance(model_data, dict) else MODEL_KEYS
+        if missing:
+            raise ValueError(f"{filepath} is not a saved model (missing {', '.join(missing)})")
     
     @classmethod
-    def load_models(cls, filepath, data_file):
-        predictor = cls(data_file)
+    def load_models(cls, filepath, data_file, scoring_engine='ensemble', cutoff_store=None, warm_uncertainty=True):
+        predictor = cls(data_file, scoring_engine, cutoff_store)
         try:
+            import joblib
             model_data = joblib.load(filepath)
             
             predictor.admission_model = model_data['admission_model']
@@ -315,12 +637,15 @@ class AdvancedPGCETPredictor:
             predictor.category_encoder = model_data['category_encoder']
             predictor.college_encoder = model_data['college_encoder']
             predictor.scaler = model_data['scaler']
+            predictor.analytic_model.coefficients = model_data.get('analytic_coefficients', {})
+            predictor.model_file = filepath
+            predictor.prepare_serving(model_data.get('colleges_data'), warm_uncertainty)
             predictor.is_trained = True
             
-            print(f"✅ Models loaded from {filepath}")
+            logger.info("✅ Models loaded from %s", filepath)
             return predictor
         except FileNotFoundError:
-            print(f"❌ Model file {filepath} not found!")
+            logger.error("❌ Model file %s not found!", filepath)
             return predictor
 
 
@@ -349,9 +674,9 @@ if __name__ == "__main__":
         
         print(f"\n🎯 Top 5 predictions for rank 3500, GM category:")
         for i, pred in enumerate(test_predictions[:5], 1):
-            print(f"{i}. {pred['college_name'][:50]}")
-            print(f"   📍 {pred['city']} | 🎯 Cutoff: {pred['cutoff_rank']}")
-            print(f"   📊 Probability: {pred['admission_probability']:.1%} | 🛡️ {pred['safety_level']}")
-            print(f"   🔄 Best Round: {pred['best_round']}")
+            print(f"{i}. {pred.college_name[:50]}")
+            print(f"   📍 {pred.city} | 🎯 Cutoff: {pred.cutoff_rank}")
+            print(f"   📊 Probability: {pred.admission_probability:.1%} | 🛡️ {pred.safety_level}")
+            print(f"   🔄 Best Round: {pred.best_round}")
     else:
         print("❌ Training failed! Check your data file.")
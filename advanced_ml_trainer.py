@@ -0,0 +1,125 @@
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, mean_absolute_error
+
+from advanced_ml_predictor import FEATURE_COLUMNS
+
+
+class PGCETModelTrainer:
+    """Training-only code for AdvancedPGCETPredictor.
+
+    Kept out of advanced_ml_predictor so that serving workers never import
+    pandas or the sklearn training/metrics modules.
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def build_models(self):
+        """Attach fresh, untrained models and encoders to the predictor"""
+        predictor = self.predictor
+        predictor.admission_model = RandomForestClassifier(n_estimators=200, random_state=42)
+        predictor.probability_model = GradientBoostingRegressor(n_estimators=150, random_state=42)
+        predictor.cutoff_trend_model = RandomForestRegressor(n_estimators=100, random_state=42)
+
+        predictor.category_encoder = LabelEncoder()
+        predictor.college_encoder = LabelEncoder()
+        predictor.city_encoder = LabelEncoder()
+        predictor.scaler = StandardScaler()
+
+    def create_comprehensive_training_data(self):
+        """Create comprehensive training dataset"""
+        training_samples = []
+        predictor = self.predictor
+
+        if not predictor.colleges_data:
+            print("❌ No college data available for training!")
+            return pd.DataFrame()
+
+        for i, college in enumerate(predictor.records()):
+            college_features = predictor.college_features(i).to_dict()
+
+            # Process all rounds or primary cutoffs
+            for round_cutoffs in college.rounds_or_primary():
+                round_name = round_cutoffs.round_name
+                for category, cutoff in round_cutoffs.items():
+                    if cutoff is not None:
+
+                        # Generate positive samples (admitted students)
+                        for rank in range(2001, cutoff + 1, 120):
+                            sample = {
+                                'student_rank': rank,
+                                'category': category,
+                                'college_code': college.college_code,
+                                'round': round_name,
+                                'cutoff_rank': cutoff,
+                                'gets_admission': 1,
+                                'admission_probability': min(0.95, 0.6 + (cutoff - rank) / cutoff * 0.35),
+                                **college_features
+                            }
+                            training_samples.append(sample)
+
+                        # Generate negative samples (not admitted)
+                        for rank in range(cutoff + 50, min(cutoff + 1800, 11000), 180):
+                            sample = {
+                                'student_rank': rank,
+                                'category': category,
+                                'college_code': college.college_code,
+                                'round': round_name,
+                                'cutoff_rank': cutoff,
+                                'gets_admission': 0,
+                                'admission_probability': max(0.05, 0.4 - (rank - cutoff) / cutoff * 0.35),
+                                **college_features
+                            }
+                            training_samples.append(sample)
+
+        return pd.DataFrame(training_samples)
+
+    def train_models(self):
+        """Train all ML models"""
+        predictor = self.predictor
+        self.build_models()
+
+        print("🤖 Creating comprehensive training dataset...")
+        training_data = self.create_comprehensive_training_data()
+
+        if training_data.empty:
+            print("❌ No training data available!")
+            return 0, 0
+
+        print(f"📊 Generated {len(training_data)} training samples")
+
+        # Encode categorical variables
+        training_data['category_encoded'] = predictor.category_encoder.fit_transform(training_data['category'])
+        training_data['college_encoded'] = predictor.college_encoder.fit_transform(training_data['college_code'])
+
+        X = training_data[FEATURE_COLUMNS]
+        y_admission = training_data['gets_admission']
+        y_probability = training_data['admission_probability']
+
+        # Scale features
+        X_scaled = predictor.scaler.fit_transform(X)
+
+        # Split data
+        X_train, X_test, y_adm_train, y_adm_test, y_prob_train, y_prob_test = train_test_split(
+            X_scaled, y_admission, y_probability, test_size=0.2, random_state=42
+        )
+
+        # Train admission classifier
+        print("🎯 Training admission prediction model...")
+        predictor.admission_model.fit(X_train, y_adm_train)
+        adm_accuracy = accuracy_score(y_adm_test, predictor.admission_model.predict(X_test))
+
+        # Train probability regressor
+        print("📈 Training probability prediction model...")
+        predictor.probability_model.fit(X_train, y_prob_train)
+        prob_mae = mean_absolute_error(y_prob_test, predictor.probability_model.predict(X_test))
+
+        print(f"✅ Admission Model Accuracy: {adm_accuracy:.3f}")
+        print(f"✅ Probability Model MAE: {prob_mae:.3f}")
+
+        predictor.prepare_serving(warm_uncertainty=False)
+        predictor.is_trained = True
+        return adm_accuracy, prob_mae
@@ -0,0 +1,146 @@
+import time
+
+import numpy as np
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AnalyticAdmissionModel:
+    """Closed-form admission probability used as a fast scoring engine.
+
+    The training labels built by PGCETModelTrainer are deterministic
+    functions of the relative margin (cutoff - rank) / cutoff, so the
+    ensembles mostly re-learn that curve. Uncalibrated, this model returns
+    the same average the ensemble computes, (admitted + label) / 2, straight
+    from the formula; calibrate() fits a two-parameter logistic per category
+    to the ensemble's own outputs. Everything is vectorized over colleges.
+    """
+
+    def __init__(self):
+        # category -> (slope, intercept) of the logistic on the margin
+        self.coefficients = {}
+
+    @staticmethod
+    def margins(student_ranks, cutoffs):
+        cutoffs = np.asarray(cutoffs, dtype=float)
+        return (cutoffs - student_ranks) / cutoffs
+
+    @staticmethod
+    def label_curve(student_ranks, cutoffs):
+        """The admission_probability label used for training, vectorized"""
+        margin = AnalyticAdmissionModel.margins(student_ranks, cutoffs)
+        admitted = margin >= 0
+        return np.where(admitted,
+                        np.minimum(0.95, 0.6 + margin * 0.35),
+                        np.maximum(0.05, 0.4 + margin * 0.35))
+
+    def predict(self, student_ranks, cutoffs, category=None):
+        """Admission probability for arrays of ranks and cutoffs"""
+        if category in self.coefficients:
+            slope, intercept = self.coefficients[category]
+            margin = self.margins(student_ranks, cutoffs)
+            return 1.0 / (1.0 + np.exp(-(slope * margin + intercept)))
+
+        admitted = (np.asarray(student_ranks) <= np.asarray(cutoffs)).astype(float)
+        return (admitted + self.label_curve(student_ranks, cutoffs)) / 2
+
+    def fit_category(self, category, margins, targets, iterations=25):
+        """Fit sigmoid(slope * margin + intercept) to soft targets by Newton's method"""
+        X = np.column_stack([margins, np.ones(len(margins))])
+        y = np.clip(targets, 1e-4, 1 - 1e-4)
+        weights = np.zeros(2)
+
+        for _ in range(iterations):
+            p = 1.0 / (1.0 + np.exp(-(X @ weights)))
+            gradient = X.T @ (p - y)
+            hessian = (X * (p * (1 - p))[:, None]).T @ X + np.eye(2) * 1e-6
+            step = np.linalg.solve(hessian, gradient)
+            weights -= step
+            if np.abs(step).max() < 1e-8:
+                break
+
+        self.coefficients[category] = (float(weights[0]), float(weights[1]))
+        return self.coefficients[category]
+
+    def calibrate(self, predictor, rank_step=250):
+        """Fit per-category curves to the trained ensemble over a rank grid"""
+        for category in predictor.category_names:
+            ranks, cutoffs, probabilities = ensemble_grid(predictor, category, rank_step)
+            if len(ranks) < 10:
+                continue
+            self.fit_category(category, self.margins(ranks, cutoffs), probabilities)
+        logger.info("✅ Calibrated analytic model for %d categories", len(self.coefficients))
+        return self.coefficients
+
+
+def ensemble_grid(predictor, category, rank_step=250):
+    """Ensemble probabilities for every eligible (rank, college) pair on a grid"""
+    ranks, cutoffs, probabilities = [], [], []
+    for student_rank in range(1, int(predictor.cutoff_tensor.max()) + 1, rank_step):
+        college_idx, best_cutoffs, _ = predictor.eligible_cutoffs(student_rank, category)
+        probs = predictor.ensemble_probabilities(student_rank, category, college_idx, best_cutoffs, fallback=False)
+        scored = ~np.isnan(probs)
+        ranks.append(np.full(scored.sum(), student_rank))
+        cutoffs.append(best_cutoffs[scored])
+        probabilities.append(probs[scored])
+
+    if not ranks:
+        return np.array([]), np.array([]), np.array([])
+    return np.concatenate(ranks), np.concatenate(cutoffs), np.concatenate(probabilities)
+
+
+def accuracy_report(predictor, categories=None, ranks=(500, 1500, 3000, 5000, 8000, 12000, 20000), top_n=20):
+    """Compare the analytic engine against the ensembles per category"""
+    report = {}
+    for category in categories or predictor.category_names:
+        errors, overlaps = [], []
+        timings = {'ensemble': 0.0, 'analytic': 0.0}
+
+        for student_rank in ranks:
+            results = {}
+            for engine in timings:
+                started = time.perf_counter()
+                results[engine] = predictor.predict_with_intelligence(student_rank, category, engine=engine)
+                timings[engine] += time.perf_counter() - started
+
+            ensemble = {p.college_code: p.admission_probability for p in results['ensemble']}
+            analytic = {p.college_code: p.admission_probability for p in results['analytic']}
+            errors.extend(abs(ensemble[code] - analytic[code]) for code in ensemble.keys() & analytic.keys())
+
+            top_ensemble = {p.college_code for p in results['ensemble'][:top_n]}
+            top_analytic = {p.college_code for p in results['analytic'][:top_n]}
+            if top_ensemble:
+                overlaps.append(len(top_ensemble & top_analytic) / len(top_ensemble))
+
+        report[category] = {
+            'mean_abs_error': float(np.mean(errors)) if errors else None,
+            'max_abs_error': float(np.max(errors)) if errors else None,
+            f'top_{top_n}_overlap': float(np.mean(overlaps)) if overlaps else None,
+            'ensemble_ms_per_request': timings['ensemble'] / len(ranks) * 1000,
+            'analytic_ms_per_request': timings['analytic'] / len(ranks) * 1000
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    from advanced_ml_predictor import AdvancedPGCETPredictor
+
+    model_file = sys.argv[1] if len(sys.argv) > 1 else 'advanced_pgcet_model.pkl'
+    predictor = AdvancedPGCETPredictor.load_models(model_file, 'combined_pgcet_data.json', warm_uncertainty=False)
+    if not predictor.is_trained:
+        print("❌ Train the ensemble first: python advanced_ml_predictor.py")
+        exit(1)
+
+    print("📊 Uncalibrated analytic engine vs ensemble:")
+    for category, stats in accuracy_report(predictor).items():
+        print(f"   {category}: {stats}")
+
+    predictor.analytic_model.calibrate(predictor)
+    print("📊 Calibrated analytic engine vs ensemble:")
+    for category, stats in accuracy_report(predictor).items():
+        print(f"   {category}: {stats}")
+
+    predictor.save_models(model_file)
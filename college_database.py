@@ -0,0 +1,312 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+
+from pgcet_records import CATEGORIES, CollegeSummary, feature_matrix, load_college_records, summary_features
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Primary cutoffs are stored as a pseudo-round ahead of the real ones
+PRIMARY_ROUND = 'Primary'
+
+SCHEMA = '''
+CREATE TABLE colleges (
+    position INTEGER PRIMARY KEY,
+    college_code TEXT NOT NULL,
+    college_name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    city TEXT,
+    city_id INTEGER,
+    institution_type_id INTEGER,
+    round TEXT,
+    year INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX idx_colleges_code ON colleges (college_code, year);
+
+CREATE TABLE college_rounds (
+    college_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    round TEXT NOT NULL,
+    round_position INTEGER NOT NULL,
+    PRIMARY KEY (college_code, year, round)
+) WITHOUT ROWID;
+
+CREATE TABLE cutoffs (
+    college_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    round TEXT NOT NULL,
+    round_position INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    category_position INTEGER NOT NULL,
+    cutoff INTEGER,
+    PRIMARY KEY (college_code, year, round, category)
+) WITHOUT ROWID;
+CREATE INDEX idx_cutoffs_range ON cutoffs (category, round, cutoff);
+'''
+
+# Colleges are keyed by (college_code, year); year 0 means the data carried no year
+
+# Primary cutoff first; with a preferred round only that round is a fallback,
+# unless the college has no such round, in which case the first round with a value is
+_SEARCH_SQL = '''
+WITH chosen AS (
+    SELECT c.college_code, c.year, c.round, c.cutoff,
+           ROW_NUMBER() OVER (PARTITION BY c.college_code, c.year ORDER BY c.round_position) AS choice
+    FROM cutoffs c
+    WHERE c.category = :category AND c.cutoff IS NOT NULL
+      AND (c.round = :primary OR :preferred IS NULL OR c.round = :preferred
+           OR NOT EXISTS (SELECT 1 FROM college_rounds r
+                          WHERE r.college_code = c.college_code AND r.year = c.year AND r.round = :preferred))
+)
+SELECT k.college_code, k.college_name, k.location, k.city, chosen.round, chosen.cutoff
+FROM chosen JOIN colleges k ON k.college_code = chosen.college_code AND k.year = chosen.year
+WHERE chosen.choice = 1 AND chosen.cutoff >= :rank
+ORDER BY chosen.cutoff, k.position
+'''
+
+# Serving cutoffs are a college's real rounds, or its primary cutoffs when it has none;
+# both placeholders take PRIMARY_ROUND
+_SERVING_ROUND = '''
+(c.round != ? OR NOT EXISTS (SELECT 1 FROM college_rounds r
+                             WHERE r.college_code = c.college_code AND r.year = c.year AND r.round != ?))
+'''
+
+# One range scan of idx_cutoffs_range per round: category = ?, round = ?, cutoff >= ?
+_ELIGIBLE_SQL = '''
+SELECT k.position, c.round, c.cutoff
+FROM cutoffs c JOIN colleges k ON k.college_code = c.college_code AND k.year = c.year
+WHERE c.category = ? AND c.round IN ({rounds}) AND c.cutoff >= ? AND ''' + _SERVING_ROUND
+
+
+class CollegeDatabase:
+    """Optional SQLite storage for (college, year) rows and their (round, category) cutoffs.
+
+    create() bulk-loads a new file in one transaction and renames it into
+    place. Readers borrow read-only connections from a small pool, so
+    threads in a worker do not open a connection per query.
+    """
+
+    def __init__(self, path, pool_size=4):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+
+    @classmethod
+    def create(cls, path, colleges):
+        """Write colleges (JSON dicts or CollegeRecords) to a fresh database at path"""
+        records = load_college_records(colleges) if colleges and isinstance(colleges[0], dict) else colleges
+        temporary = f'{path}.{os.getpid()}.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+        connection = sqlite3.connect(temporary)
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                connection.executemany(
+                    'INSERT INTO colleges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(i, c.college_code, c.college_name, c.location, c.city, c.city_id,
+                      c.institution_type_id, c.round, c.year or 0) for i, c in enumerate(records)])
+                connection.executemany('INSERT INTO college_rounds VALUES (?, ?, ?, ?)', cls._round_rows(records))
+                connection.executemany('INSERT INTO cutoffs VALUES (?, ?, ?, ?, ?, ?, ?)', cls._cutoff_rows(records))
+            connection.execute('ANALYZE')
+        finally:
+            connection.close()
+        os.replace(temporary, path)
+        logger.info("🗄️ Wrote %d colleges to %s", len(records), path)
+        return cls(path)
+
+    @staticmethod
+    def _rounds(college):
+        return ((PRIMARY_ROUND, college.cutoffs),) + tuple((r.round_name, r) for r in college.rounds)
+
+    @classmethod
+    def _round_rows(cls, records):
+        for college in records:
+            for position, (round_name, _) in enumerate(cls._rounds(college)):
+                yield college.college_code, college.year or 0, round_name, position
+
+    @classmethod
+    def _cutoff_rows(cls, records):
+        for college in records:
+            for round_position, (round_name, round_cutoffs) in enumerate(cls._rounds(college)):
+                for category_position, (category, cutoff) in enumerate(round_cutoffs.items()):
+                    yield (college.college_code, college.year or 0, round_name, round_position,
+                           category, category_position, cutoff)
+
+    def _connect(self):
+        connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        """Close pooled connections, e.g. after the file was replaced"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def search_by_rank(self, student_rank, category, round_preference=None):
+        """(code, name, location, city, round used, cutoff) rows the rank is eligible for, best cutoff first"""
+        with self.connection() as connection:
+            return connection.execute(_SEARCH_SQL, {
+                'category': category, 'rank': student_rank,
+                'primary': PRIMARY_ROUND, 'preferred': round_preference
+            }).fetchall()
+
+    def eligible_rows(self, student_rank, category, round_names):
+        """(college position, round, cutoff) serving rows at or above the rank in round_names"""
+        sql = _ELIGIBLE_SQL.format(rounds=', '.join('?' * len(round_names)))
+        with self.connection() as connection:
+            return connection.execute(
+                sql, (category, *round_names, max(student_rank, 1), PRIMARY_ROUND, PRIMARY_ROUND)).fetchall()
+
+    def has_college(self, college_code):
+        with self.connection() as connection:
+            return connection.execute(
+                'SELECT 1 FROM colleges WHERE college_code = ?', (college_code,)).fetchone() is not None
+
+    def round_cutoffs(self, college_code, category, year=None):
+        """(round, cutoff) rows of a college, from its latest year unless year is given"""
+        with self.connection() as connection:
+            if year is None:
+                year = connection.execute(
+                    'SELECT MAX(year) FROM colleges WHERE college_code = ?', (college_code,)).fetchone()[0]
+            return connection.execute(
+                'SELECT round, cutoff FROM cutoffs WHERE college_code = ? AND year = ? AND category = ? '
+                'AND round != ? AND cutoff IS NOT NULL ORDER BY round_position',
+                (college_code, year, category, PRIMARY_ROUND)).fetchall()
+
+    def statistics(self):
+        with self.connection() as connection:
+            return {
+                'total_colleges': connection.execute(
+                    'SELECT COUNT(DISTINCT college_code) FROM colleges').fetchone()[0],
+                'cities': [row[0] for row in connection.execute(
+                    "SELECT DISTINCT COALESCE(NULLIF(city, ''), 'Unknown') FROM colleges")],
+                'rounds': [row[0] for row in connection.execute(
+                    'SELECT DISTINCT round FROM college_rounds WHERE round != ?', (PRIMARY_ROUND,))],
+                'categories': [row[0] for row in connection.execute(
+                    'SELECT DISTINCT category FROM cutoffs WHERE round = ? AND cutoff IS NOT NULL',
+                    (PRIMARY_ROUND,))]
+            }
+
+    def load_colleges(self):
+        """All colleges as JSON-shaped dicts, in their original order"""
+        with self.connection() as connection:
+            colleges = {}
+            for row in connection.execute('SELECT * FROM colleges ORDER BY position'):
+                college = {'collegeCode': row['college_code'], 'collegeName': row['college_name'],
+                           'location': row['location'], 'city': row['city'], 'cutoffs': {}, 'rounds': {}}
+                for key, column in (('cityId', 'city_id'), ('institutionTypeId', 'institution_type_id'),
+                                    ('round', 'round')):
+                    if row[column] is not None:
+                        college[key] = row[column]
+                if row['year']:
+                    college['year'] = row['year']
+                colleges[row['college_code'], row['year']] = college
+
+            for code, year, round_name in connection.execute(
+                    'SELECT college_code, year, round FROM college_rounds WHERE round != ? '
+                    'ORDER BY college_code, year, round_position', (PRIMARY_ROUND,)):
+                colleges[code, year]['rounds'][round_name] = {}
+
+            for code, year, round_name, category, cutoff in connection.execute(
+                    'SELECT college_code, year, round, category, cutoff FROM cutoffs '
+                    'ORDER BY college_code, year, round_position, category_position'):
+                college = colleges[code, year]
+                target = college['cutoffs'] if round_name == PRIMARY_ROUND else college['rounds'][round_name]
+                target[category] = cutoff
+        return list(colleges.values())
+
+    def load_records(self):
+        return load_college_records(self.load_colleges())
+
+    def load_summaries(self):
+        """One CollegeSummary per (college, year) row, in their original order"""
+        with self.connection() as connection:
+            return [CollegeSummary(row['college_code'], row['college_name'], row['location'],
+                                   row['city'] or row['location'].split(',')[-1].strip(),
+                                   row['city_id'], row['institution_type_id'])
+                    for row in connection.execute('SELECT * FROM colleges ORDER BY position')]
+
+    def pack_serving(self, summaries):
+        """(round names, category names, cutoff tensor, primary cutoffs, feature matrix) for summaries.
+
+        The same arrays pack_cutoffs, pack_primary and feature_matrix build
+        from records, filled from one ordered scan of the cutoffs table.
+        """
+        with self.connection() as connection:
+            real_rounds = [[] for _ in summaries]
+            for position, round_name in connection.execute(
+                    'SELECT k.position, r.round FROM college_rounds r '
+                    'JOIN colleges k ON k.college_code = r.college_code AND k.year = r.year '
+                    'WHERE r.round != ? ORDER BY k.position, r.round_position', (PRIMARY_ROUND,)):
+                real_rounds[position].append(round_name)
+            round_names = []
+            for rounds in real_rounds:
+                for round_name in rounds or (PRIMARY_ROUND,):
+                    if round_name not in round_names:
+                        round_names.append(round_name)
+
+            category_names = list(CATEGORIES)
+            for (category,) in connection.execute(
+                    'SELECT c.category FROM cutoffs c '
+                    'JOIN colleges k ON k.college_code = c.college_code AND k.year = c.year '
+                    f'WHERE c.category NOT IN ({", ".join("?" * len(CATEGORIES))}) AND {_SERVING_ROUND} '
+                    'ORDER BY k.position, c.round_position, c.category_position',
+                    (*CATEGORIES, PRIMARY_ROUND, PRIMARY_ROUND)):
+                if category not in category_names:
+                    category_names.append(category)
+            round_index = {round_name: i for i, round_name in enumerate(round_names)}
+            category_index = {category: i for i, category in enumerate(category_names)}
+
+            tensor = np.zeros((len(summaries), len(round_names), len(category_names)), dtype=np.int32)
+            primary = np.zeros((len(summaries), len(category_names)), dtype=np.int32)
+            round_values = [[] for _ in summaries]
+            primary_values = [[] for _ in summaries]
+            for position, round_name, category, cutoff in connection.execute(
+                    'SELECT k.position, c.round, c.category, c.cutoff FROM cutoffs c '
+                    'JOIN colleges k ON k.college_code = c.college_code AND k.year = c.year '
+                    'ORDER BY k.position, c.round_position, c.category_position'):
+                if round_name == PRIMARY_ROUND:
+                    if cutoff is not None:
+                        primary_values[position].append(cutoff)
+                    if cutoff and category in category_index:
+                        primary[position, category_index[category]] = cutoff
+                    if real_rounds[position]:
+                        continue
+                elif cutoff is not None:
+                    round_values[position].append(cutoff)
+                if cutoff:
+                    tensor[position, round_index[round_name], category_index[category]] = cutoff
+
+        # Features read every cutoff of the real rounds, or the primary ones when there are none
+        features = feature_matrix([summary_features(summary, round_values[i] or primary_values[i], len(real_rounds[i]))
+                                   for i, summary in enumerate(summaries)])
+        return round_names, category_names, tensor, primary, features
+
+
+def is_database_file(path):
+    return path.endswith(('.db', '.sqlite', '.sqlite3'))
@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from college_normalizer import CITY_IDS, canonical_city, institution_flags, tier1_city_ids
+from pgcet_records import FEATURE_FIELDS
+
+
+class CollegeBitsetIndex:
+    """Inverted indexes from attributes to bitsets of college ids.
+
+    Bit i is college i of the predictor's colleges_data and row i of its
+    feature matrix. Bitsets are plain Python ints, so filters combine with
+    & and | before any model work.
+    """
+
+    # Filter name -> CollegeFeatures flag
+    FLAGS = {
+        'government': 'is_government',
+        'university': 'is_university',
+        'autonomous': 'is_autonomous',
+        'institute_tech': 'is_institute_tech',
+        'tier1_city': 'is_tier1_city'
+    }
+
+    MAX_CACHED_CITIES = 1024
+
+    def __init__(self, colleges, features, cutoff_tensor, category_names):
+        colleges = list(colleges)
+        self.size = len(colleges)
+        self.all_bits = (1 << self.size) - 1
+
+        # Location string -> colleges at it; a city query ORs every location containing it
+        self.location_bits = {}
+        for i, college in enumerate(colleges):
+            location = college.location.upper()
+            self.location_bits[location] = self.location_bits.get(location, 0) | (1 << i)
+        # Normalized data carries integer city codes; those lookups skip the substring scan
+        self.city_id_bits = {}
+        if colleges and all(college.city_id is not None for college in colleges):
+            for i, college in enumerate(colleges):
+                self.city_id_bits[college.city_id] = self.city_id_bits.get(college.city_id, 0) | (1 << i)
+        self._city_cache = {}
+        self._lock = threading.Lock()
+
+        self.flag_bits = {}
+        for name, flag in self.FLAGS.items():
+            column = features[:, FEATURE_FIELDS.index(flag)]
+            self.flag_bits[name] = self._bits(
+                i for i, college in enumerate(colleges) if self._flag(college, flag, column[i]))
+
+        offered = (cutoff_tensor > 0).any(axis=1)
+        self.category_bits = {
+            category: self._bits(np.flatnonzero(offered[:, c]).tolist())
+            for c, category in enumerate(category_names)
+        }
+
+    @staticmethod
+    def _flag(college, flag, feature):
+        """Flags implied by the normalized city and institution codes, else the name-derived feature"""
+        if flag == 'is_tier1_city' and college.city_id is not None:
+            return bool(tier1_city_ids(college.city_id))
+        if college.institution_type_id is not None:
+            flags = institution_flags(college.institution_type_id)
+            if flag in flags:
+                return flags[flag]
+        return bool(feature)
+
+    @staticmethod
+    def _bits(indices):
+        bits = 0
+        for i in indices:
+            bits |= 1 << i
+        return bits
+
+    def city_bits(self, city):
+        """Colleges whose location contains the city name (case-insensitive)"""
+        city = city.upper()
+        if self.city_id_bits:
+            canonical = canonical_city(city)
+            if canonical:
+                return self.city_id_bits.get(CITY_IDS[canonical], 0)
+        bits = self._city_cache.get(city)
+        if bits is None:
+            bits = 0
+            for location, location_bits in self.location_bits.items():
+                if city in location:
+                    bits |= location_bits
+            with self._lock:
+                if len(self._city_cache) >= self.MAX_CACHED_CITIES:
+                    self._city_cache.clear()
+                self._city_cache[city] = bits
+        return bits
+
+    @classmethod
+    def filter_error(cls, filters):
+        """Why filters from a request are unusable, or None when filter_bits accepts them"""
+        if filters is None:
+            return None
+        if not isinstance(filters, dict):
+            return "filters must be an object such as {'city': 'BANGALORE', 'government': true}"
+        for name, value in filters.items():
+            if name == 'city':
+                if value is not None and not isinstance(value, str):
+                    return "filters.city must be a string"
+            elif name in cls.FLAGS:
+                if value is not None and not isinstance(value, bool):
+                    return f"filters.{name} must be true or false"
+            else:
+                return f"Unknown filter {name!r}, expected 'city' or one of {sorted(cls.FLAGS)}"
+        return None
+
+    def filter_bits(self, filters):
+        """Intersect hard filters such as {'city': 'BANGALORE', 'government': True}"""
+        bits = self.all_bits
+        for name, value in (filters or {}).items():
+            if name == 'city':
+                if value:
+                    bits &= self.city_bits(value)
+            elif name in self.flag_bits:
+                if value:
+                    bits &= self.flag_bits[name]
+            else:
+                raise ValueError(f"Unknown filter {name!r}, expected 'city' or one of {sorted(self.flag_bits)}")
+        return bits
+
+    def mask(self, bits):
+        """Bitset -> numpy boolean mask over all colleges"""
+        raw = np.frombuffer(bits.to_bytes((self.size + 7) // 8 or 1, 'little'), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder='little')[:self.size].astype(bool)
+
+    def indices(self, bits):
+        return np.flatnonzero(self.mask(bits))
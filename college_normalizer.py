@@ -0,0 +1,243 @@
+import json
+import re
+
+
+# Canonical city table. Ids are positions in this tuple, 0 means unknown;
+# append new cities at the end so existing ids stay stable.
+CITIES = ('', 'BANGALORE', 'MYSORE', 'MANGALORE', 'HUBLI', 'DHARWAD', 'BELGAUM', 'GULBARGA',
+          'DAVANGERE', 'SHIMOGA', 'TUMKUR', 'BIJAPUR', 'BELLARY', 'MANDYA', 'HASSAN', 'BIDAR',
+          'BAGALKOT', 'CHICKBALLAPUR', 'CHAMARAJANAGAR', 'BHALKI', 'PUTTUR', 'TIPTUR',
+          'NELAMANGALA', 'DEVANAHALLI', 'CHIKODI', 'MOODBIDRI', 'BHATKAL', 'KANAKAPURA',
+          'UDUPI', 'KOLAR', 'RAICHUR', 'CHITRADURGA', 'GUBBI', 'JAMKHANDI', 'SIRUGUPPA',
+          'DODDABALLAPUR', 'KUNDAPURA', 'NANJANGUD', 'KOPPAL', 'HONNAVAR')
+CITY_IDS = {city: i for i, city in enumerate(CITIES)}
+
+CITY_ALIASES = {
+    'BENGALURU': 'BANGALORE', 'BANGALURU': 'BANGALORE', 'MYSURU': 'MYSORE',
+    'MANGALURU': 'MANGALORE', 'HUBBALLI': 'HUBLI', 'BELAGAVI': 'BELGAUM',
+    'KALABURAGI': 'GULBARGA', 'DAVANAGERE': 'DAVANGERE', 'SHIVAMOGGA': 'SHIMOGA',
+    'TUMAKURU': 'TUMKUR', 'VIJAYAPURA': 'BIJAPUR', 'BALLARI': 'BELLARY',
+    'BAGALKOTE': 'BAGALKOT', 'CHIKKABALLAPURA': 'CHICKBALLAPUR', 'CHIKKABALLAPUR': 'CHICKBALLAPUR',
+    'CHAMARAJANAGARA': 'CHAMARAJANAGAR', 'MOODABIDRI': 'MOODBIDRI', 'DODDABALLAPURA': 'DODDABALLAPUR',
+    'NANJANAGUDU': 'NANJANGUD',
+    # Localities the PDFs print without their city (or before a truncated one)
+    'YELAHANKA': 'BANGALORE', 'HEBBAL': 'BANGALORE', 'SARJAPURA': 'BANGALORE', 'GOTTIGERE': 'BANGALORE',
+    'BANNERUGATTA': 'BANGALORE', 'BANNERGHATTA': 'BANGALORE', 'VISHWANEEDAM': 'BANGALORE',
+    'BIDARAHALLI': 'BANGALORE', 'VIRGONAGAR': 'BANGALORE', 'RAJANAKUNTE': 'BANGALORE',
+    'CHIKKAHAGADE': 'BANGALORE', 'HEBBAGODI': 'BANGALORE', 'DODDAKANNELLI': 'BANGALORE',
+    'HESARAGHATTA': 'BANGALORE', 'BASAVANAGUDI': 'BANGALORE', 'CHIKKABANAVARA': 'BANGALORE',
+    'KENGERI': 'BANGALORE', 'KORAMANGALA': 'BANGALORE', 'JAYANAGAR': 'BANGALORE',
+    'HOOTAGALLI': 'MYSORE', 'GOKULAM': 'MYSORE', 'THANDAVAPURA': 'NANJANGUD', 'KODIALBAIL': 'MANGALORE',
+    'PRASANNAHALLI': 'DEVANAHALLI', 'DARBE': 'PUTTUR', 'MOODLAKATTE': 'KUNDAPURA', 'TALAKAL': 'KOPPAL',
+    'BHARATHINAGARA': 'MANDYA', 'RAGUVANAHALLI': 'BANGALORE'
+}
+
+TIER1_CITIES = ('BANGALORE', 'MYSORE', 'HUBLI', 'MANGALORE')
+TIER1_CITY_IDS = {CITY_IDS[city] for city in TIER1_CITIES}
+
+# Institution types, checked in order against the upper-cased name
+INSTITUTION_TYPES = ('other', 'university', 'university_centre', 'government',
+                     'institute_tech', 'management', 'college')
+INSTITUTION_TYPE_IDS = {kind: i for i, kind in enumerate(INSTITUTION_TYPES)}
+_INSTITUTION_RULES = (
+    ('university_centre', ('DEPARTMENT', 'PG CENTER', 'PG CENTRE', '(RO)', 'CONSTITUENT')),
+    ('university', ('UNIVERSITY', 'UNIVESITY', 'UNIERSITY', '(UNI.)')),
+    ('government', ('GOVERNMENT', 'GOVT')),
+    ('institute_tech', ('INSTITUTE OF TECHNOLOGY', 'ENGINEERING', 'TECHNICAL', 'ENGG')),
+    ('management', ('MANAGEMENT', 'BUSINESS SCHOOL')),
+    ('college', ('COLLEGE', 'ACADEMY', 'SCHOOL'))
+)
+# CollegeFeatures flags each institution type implies
+_INSTITUTION_FLAGS = {
+    'is_university': ('university', 'university_centre'),
+    'is_institute_tech': ('institute_tech',),
+    'is_college': ('college',),
+    'is_government': ('university', 'university_centre', 'government')
+}
+_NAME_WORDS = ('COLLEGE', 'INSTIT', 'UNIVERSITY', 'UNIVESITY', 'UNIERSITY',
+               'ACADEMY', 'SCHOOL', 'CENTER', 'CENTRE', 'DEPARTMENT')
+
+# Course lines ("C  - MCA", "MC  - MCA", "MI  - MCA-\nCOMP.APPL AI \nML(DATASCE.)")
+# the regex parse drags into locations
+_HEADER_JUNK = re.compile(r'\b[A-Z]{1,2}\s+-\s+MCA\b(?:-\s*COMP\.APPL[^\n]*\n\s*\S*)?')
+# The third-round PDF prints the address straight after the name ("COLLEGEPAMPA MAHAKAVI ROAD")
+_FUSED_ADDRESS = re.compile(r'((?i:college|institute|technology|engineering|school|business|studies|'
+                            r'management|commerce|university|uniersity))(?=[A-Z0-9#])(?!S\b)')
+_SEGMENT_BREAK = re.compile(r' {2,}')
+_WORD = re.compile(r'[A-Z]+')
+
+
+def canonical_city(text):
+    """Canonical city for one token or free text, '' when none is recognised"""
+    words = _WORD.findall((text or '').upper())
+    for i in reversed(range(len(words))):
+        # "KANAKAPURA ROAD" and "MYSORE ROAD" are streets, not the town
+        if words[i + 1:i + 2] in (['ROAD'], ['RD']):
+            continue
+        word = CITY_ALIASES.get(words[i], words[i])
+        if word in CITY_IDS and word:
+            return word
+    # PDF columns truncate the last word ("BANGALO", "TUM"); accept an unambiguous prefix
+    if words and len(words[-1]) >= 3:
+        matches = {city for city in list(CITIES[1:]) + list(CITY_ALIASES)
+                   if city.startswith(words[-1])}
+        matches = {CITY_ALIASES.get(city, city) for city in matches}
+        if len(matches) == 1:
+            return matches.pop()
+    return ''
+
+
+def tier1_city_ids(city_id):
+    """The city id as a set when it is a tier-1 city, else an empty set"""
+    return {city_id} & TIER1_CITY_IDS
+
+
+def institution_flags(institution_type_id):
+    """is_university, is_institute_tech, is_college and is_government for a type id"""
+    kind = INSTITUTION_TYPES[institution_type_id]
+    return {flag: 1 if kind in kinds else 0 for flag, kinds in _INSTITUTION_FLAGS.items()}
+
+
+def institution_type(name):
+    name = name.upper()
+    for kind, words in _INSTITUTION_RULES:
+        if any(word in name for word in words):
+            return kind
+    return 'other'
+
+
+def split_name_and_address(name, location):
+    """Undo the regex parse: rejoin name and location, then split at the address"""
+    text = _FUSED_ADDRESS.sub(r'\1  ', _HEADER_JUNK.sub(' ', f'{name}  {location}'))
+    text = re.sub(r'\s*\n\s*', '  ', text).strip(' ,')
+    segments = [s.strip(' ,') for s in _SEGMENT_BREAK.split(text) if s.strip(' ,')]
+    if not segments:
+        return '', ''
+
+    # Initials ("K", "L S"), single words, open brackets and a trailing "and" mean the name carries on
+    name_segments = [segments.pop(0)]
+    while segments and (len(' '.join(name_segments).split()) < 2
+                        or name_segments[-1].count('(') > name_segments[-1].count(')')
+                        or name_segments[-1].upper().endswith((' AND', ' OF', ' &'))
+                        or not any(word in ' '.join(name_segments).upper() for word in _NAME_WORDS)):
+        name_segments.append(segments.pop(0))
+    return ' '.join(name_segments), ', '.join(segments)
+
+
+class CollegeNormalizer:
+    """Clean up colleges produced by MultiPDFExtractor.extract_all_pdfs.
+
+    Names and locations are re-split from the raw regex groups, cities are
+    mapped onto CITIES, duplicates by college code are merged round by
+    round, and each college gets integer cityId and institutionTypeId
+    columns. A reference table (pgcet_colleges_data.json format) overrides
+    names and locations for the codes it knows.
+    """
+
+    def __init__(self, reference=None):
+        self.reference = {college['collegeCode']: college for college in (reference or [])}
+        self.stats = {}
+        self.type_counts = {}
+
+    @classmethod
+    def from_reference_file(cls, filename='pgcet_colleges_data.json'):
+        try:
+            with open(filename, 'r') as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            print(f"⚠️ Reference table {filename} not found, normalizing without it")
+            return cls()
+
+    def normalize(self, colleges):
+        """Return normalized colleges, one per college code, in first-seen order"""
+        merged = {}
+        duplicates = 0
+        self.type_counts = {}
+        for college in colleges:
+            code = college.get('collegeCode', '').strip().upper()
+            if code in merged:
+                duplicates += 1
+                self.merge_rounds(merged[code], college)
+            else:
+                merged[code] = dict(college, collegeCode=code,
+                                    rounds={name: dict(cutoffs) for name, cutoffs in college.get('rounds', {}).items()})
+
+        normalized = [self.normalize_college(college) for college in merged.values()]
+        self.stats = {
+            'input': len(colleges),
+            'output': len(normalized),
+            'duplicates_merged': duplicates,
+            'from_reference': sum(1 for college in normalized if college['collegeCode'] in self.reference),
+            'unknown_city': sum(1 for college in normalized if not college['cityId']),
+            'institution_types': self.type_counts
+        }
+        return normalized
+
+    @staticmethod
+    def merge_rounds(target, college):
+        """Fill categories missing in target from a duplicate record of the same code"""
+        for round_name, cutoffs in college.get('rounds', {}).items():
+            existing = target['rounds'].setdefault(round_name, {})
+            for category, value in cutoffs.items():
+                if existing.get(category) is None:
+                    existing[category] = value
+
+    def normalize_college(self, college):
+        code = college['collegeCode']
+        reference = self.reference.get(code)
+        if reference:
+            name = reference['collegeName'].strip()
+            address = reference.get('location', '')
+        else:
+            name, address = split_name_and_address(college.get('collegeName', ''), college.get('location', ''))
+
+        city = canonical_city(address) or canonical_city(name)
+        locality = [part.strip() for part in address.split(',')
+                    if part.strip() and not (city and canonical_city(part) == city)]
+        kind = institution_type(name)
+        self.type_counts[kind] = self.type_counts.get(kind, 0) + 1
+
+        normalized = {
+            'collegeCode': code,
+            'collegeName': name,
+            'location': ', '.join(locality + [city] if city else locality),
+            'city': city,
+            'cityId': CITY_IDS[city],
+            'institutionTypeId': INSTITUTION_TYPE_IDS[kind],
+            'cutoffs': self.primary_cutoffs(college, reference)
+        }
+        for key in ('round', 'year'):
+            if key in college:
+                normalized[key] = college[key]
+        normalized['rounds'] = college.get('rounds', {})
+        return normalized
+
+    @staticmethod
+    def primary_cutoffs(college, reference=None):
+        """First non-empty round, as extract_all_pdfs picks it, else the existing cutoffs"""
+        rounds = college.get('rounds', {})
+        for round_name in ('First Round', 'Second Round', 'Third Round'):
+            if any(rounds.get(round_name, {}).values()):
+                return rounds[round_name]
+        if any(college.get('cutoffs', {}).values()):
+            return college['cutoffs']
+        # The reference table's cutoffs are from another source; only use them as a last resort
+        return (reference or {}).get('cutoffs', college.get('cutoffs', {}))
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'combined_pgcet_data.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else source
+
+    with open(source, 'r') as f:
+        colleges = json.load(f)
+
+    normalizer = CollegeNormalizer.from_reference_file()
+    normalized = normalizer.normalize(colleges)
+    with open(target, 'w') as f:
+        json.dump(normalized, f, indent=2)
+
+    print(f"✅ Normalized {normalizer.stats['input']} colleges into {normalizer.stats['output']} ({target})")
+    print(f"📊 {normalizer.stats}")
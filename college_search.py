@@ -0,0 +1,83 @@
+import heapq
+import re
+from collections import defaultdict
+
+
+# Abbreviations that show up in the extracted college names
+ABBREVIATIONS = {
+    'mngt': 'management', 'mgmt': 'management', 'mgt': 'management',
+    'sc': 'science', 'scs': 'sciences', 'engg': 'engineering',
+    'inst': 'institute', 'instt': 'institute', 'tech': 'technology', 'univ': 'university',
+    'uni': 'university', 'coll': 'college', 'govt': 'government', 'bangaluru': 'bangalore',
+    'bengaluru': 'bangalore', 'mysuru': 'mysore', 'mangaluru': 'mangalore'
+}
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+_CODE = re.compile(r'^c\d{3}$')
+
+
+def normalize(text):
+    """Lower-case, strip punctuation and expand known abbreviations"""
+    tokens = _NON_WORD.sub(' ', text.lower()).split()
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CollegeSearchIndex:
+    """Prefix and trigram index over college names, locations and codes.
+
+    Built once from the college records; queries score candidates from the
+    posting lists only, so a lookup touches a handful of colleges.
+    """
+
+    MAX_PREFIX = 12
+
+    def __init__(self, colleges):
+        self.colleges = list(colleges)
+        self.by_code = {college.college_code.upper(): i for i, college in enumerate(self.colleges)}
+        self.prefixes = defaultdict(set)
+        self.grams = defaultdict(set)
+        self.gram_counts = []
+
+        for i, college in enumerate(self.colleges):
+            text = normalize(f'{college.college_name} {college.location} {college.city or ""}')
+            for token in text.split() + [college.college_code.lower()]:
+                for length in range(1, min(len(token), self.MAX_PREFIX) + 1):
+                    self.prefixes[token[:length]].add(i)
+            doc_grams = trigrams(text)
+            for gram in doc_grams:
+                self.grams[gram].add(i)
+            self.gram_counts.append(len(doc_grams))
+
+    def search(self, query, limit=10):
+        """Ranked (score, college) matches for a free-text query"""
+        text = normalize(query)
+        if not text:
+            return []
+
+        scores = defaultdict(float)
+        code = text.replace(' ', '')
+        if _CODE.match(code) and code.upper() in self.by_code:
+            scores[self.by_code[code.upper()]] += 100.0
+
+        # Every query token that prefixes a word in the college is a strong signal
+        tokens = text.split()
+        for token in tokens:
+            for i in self.prefixes.get(token[:self.MAX_PREFIX], ()):
+                scores[i] += 10.0 + min(len(token), self.MAX_PREFIX)
+
+        # Trigram overlap catches typos and partial words
+        query_grams = trigrams(text)
+        overlap = defaultdict(int)
+        for gram in query_grams:
+            for i in self.grams.get(gram, ()):
+                overlap[i] += 1
+        for i, shared in overlap.items():
+            scores[i] += 10.0 * shared / (len(query_grams) + self.gram_counts[i] - shared)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(round(score, 3), self.colleges[i]) for i, score in best]
@@ -0,0 +1,85 @@
+import fcntl
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from cutoff_store import pack_cutoffs, pack_primary
+from pgcet_records import load_college_records
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+BUNDLE_FILE = 'pgcet_bundle.bin'
+BUNDLE_MAGIC = b'PGCB'
+BUNDLE_FORMAT = 1
+# Slot 0 of the round axis holds the primary cutoffs basic_search uses
+PRIMARY_ROUND = 'Primary'
+
+
+def encode_bundle(colleges):
+    """Compact cutoff bundle for the mobile page.
+
+    Layout: magic, uint32 header length, UTF-8 JSON header (version,
+    rounds, categories, colleges as [code, name, location, city]), zero
+    padding to a 4-byte boundary, then the (college, round, category)
+    int32 little-endian cutoffs, 0 = missing. A browser maps the tail
+    straight onto an Int32Array. The version is a hash of the content.
+    """
+    round_names, category_names, tensor = pack_cutoffs(colleges)
+    cutoffs = np.concatenate([pack_primary(colleges, category_names)[:, None, :], tensor], axis=1)
+    cutoffs = np.ascontiguousarray(cutoffs, dtype='<i4')
+
+    header = {
+        'format': BUNDLE_FORMAT,
+        'rounds': [PRIMARY_ROUND] + round_names,
+        'categories': category_names,
+        'colleges': [[college.college_code, college.college_name, college.location, college.display_city]
+                     for college in colleges],
+        'shape': list(cutoffs.shape)
+    }
+    content = json.dumps(header, sort_keys=True).encode('utf-8') + cutoffs.tobytes()
+    header['version'] = hashlib.sha256(content).hexdigest()[:16]
+
+    encoded = json.dumps(header, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    prefix = BUNDLE_MAGIC + struct.pack('<I', len(encoded)) + encoded
+    return prefix + b'\0' * (-len(prefix) % 4) + cutoffs.tobytes(), header['version']
+
+
+def decode_bundle(data):
+    """(header, cutoffs) from encode_bundle output"""
+    if data[:4] != BUNDLE_MAGIC:
+        raise ValueError("not a cutoff bundle")
+    length, = struct.unpack_from('<I', data, 4)
+    header = json.loads(data[8:8 + length])
+    offset = 8 + length + (-(8 + length) % 4)
+    return header, np.frombuffer(data, '<i4', offset=offset).reshape(header['shape'])
+
+
+def write_bundle(colleges, path=BUNDLE_FILE):
+    """Encode college records and atomically rename the bundle into place; returns its version"""
+    data, version = encode_bundle(colleges)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+    return version
+
+
+def build_bundle(data_file, path=BUNDLE_FILE, force=False):
+    """Rebuild the bundle from the college JSON if it is missing or older; one worker builds"""
+    if not force and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(data_file):
+        return False
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if force or not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(data_file):
+                with open(data_file, 'r') as f:
+                    version = write_bundle(load_college_records(json.load(f)), path)
+                logger.info("📦 Built cutoff bundle %s (%s) from %s", path, version, data_file)
+                return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return False
@@ -0,0 +1,264 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from college_database import CollegeDatabase, is_database_file
+from pgcet_records import (CATEGORIES, FEATURE_FIELDS, CollegeSummary, college_features, feature_matrix,
+                           load_college_records)
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# magic, format version, colleges, rounds, categories, features, then byte offsets of the
+# tensor, primary cutoffs, feature matrix, city/institution ids, string offsets and string blob
+_HEADER = struct.Struct('<4sIIIII6Q')
+_MAGIC = b'PGCS'
+_VERSION = 2
+_FIELDS = ('college_code', 'college_name', 'location', 'city')
+# Stored for a missing cityId / institutionTypeId
+_NO_ID = -1
+
+
+def pack_cutoffs(colleges):
+    """(round names, category names, (college, round, category) int32 tensor), 0 = missing"""
+    round_names = []
+    category_names = list(CATEGORIES)
+    for college in colleges:
+        for round_cutoffs in college.rounds_or_primary():
+            if round_cutoffs.round_name not in round_names:
+                round_names.append(round_cutoffs.round_name)
+            for category in round_cutoffs.categories:
+                if category not in category_names:
+                    category_names.append(category)
+
+    category_index = {category: i for i, category in enumerate(category_names)}
+    round_index = {round_name: i for i, round_name in enumerate(round_names)}
+    tensor = np.zeros((len(colleges), len(round_names), len(category_names)), dtype=np.int32)
+    for i, college in enumerate(colleges):
+        for round_cutoffs in college.rounds_or_primary():
+            r = round_index[round_cutoffs.round_name]
+            for category, cutoff in round_cutoffs.items():
+                if cutoff:
+                    tensor[i, r, category_index[category]] = cutoff
+    return round_names, category_names, tensor
+
+
+def pack_primary(colleges, category_names):
+    """(college, category) int32 primary cutoffs, 0 = missing"""
+    category_index = {category: i for i, category in enumerate(category_names)}
+    primary = np.zeros((len(colleges), len(category_names)), dtype=np.int32)
+    for i, college in enumerate(colleges):
+        for category, cutoff in college.cutoffs.items():
+            if cutoff:
+                primary[i, category_index[category]] = cutoff
+    return primary
+
+
+def pack_ids(colleges):
+    """(college, 2) int32 city and institution type ids, _NO_ID where not normalized"""
+    ids = np.full((len(colleges), 2), _NO_ID, dtype=np.int32)
+    for i, college in enumerate(colleges):
+        for j, value in enumerate((college.city_id, college.institution_type_id)):
+            if value is not None:
+                ids[i, j] = value
+    return ids
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _stored_version(path):
+    """Format version of an existing store file, None when it is not one"""
+    try:
+        with open(path, 'rb') as f:
+            magic, version = struct.unpack('<4sI', f.read(8))
+    except (OSError, struct.error):
+        return None
+    return version if magic == _MAGIC else None
+
+
+class MappedColleges(Sequence):
+    """Read-only sequence of CollegeSummary over a mapping, decoded on access"""
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def __len__(self):
+        return self._mapping.size
+
+    def __getitem__(self, i):
+        if not -self._mapping.size <= i < self._mapping.size:
+            raise IndexError(i)
+        return self._mapping.college(int(i) % self._mapping.size)
+
+
+class _Mapping:
+    """One mapped file; numpy arrays are zero-copy views into the mmap"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        # Content hash: the same data gives the same version on every worker and host
+        self.version = hashlib.sha256(self.buffer).hexdigest()[:16]
+
+        magic, version, n, r, c, f, tensor_at, primary_at, features_at, ids_at, offsets_at, blob_at = \
+            _HEADER.unpack_from(self.buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a version {_VERSION} cutoff store")
+        if f != len(FEATURE_FIELDS):
+            raise ValueError(f"{path} has {f} features per college, expected {len(FEATURE_FIELDS)}")
+        n_strings = r + c + n * len(_FIELDS)
+
+        self.tensor = np.frombuffer(self.buffer, np.int32, n * r * c, tensor_at).reshape(n, r, c)
+        self.primary = np.frombuffer(self.buffer, np.int32, n * c, primary_at).reshape(n, c)
+        # (college, FEATURE_FIELDS) float64, see pgcet_records.feature_matrix
+        self.features = np.frombuffer(self.buffer, np.float64, n * f, features_at).reshape(n, f)
+        self.ids = np.frombuffer(self.buffer, np.int32, n * 2, ids_at).reshape(n, 2)
+        self.offsets = np.frombuffer(self.buffer, np.int64, n_strings + 1, offsets_at)
+        self.blob_at = blob_at
+        self.size = n
+        self.round_names = [self.string(i) for i in range(r)]
+        self.category_names = [self.string(r + i) for i in range(c)]
+        self.category_index = {category: i for i, category in enumerate(self.category_names)}
+        self.codes = None
+
+    def string(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.buffer[self.blob_at + start:self.blob_at + end].decode('utf-8')
+
+    def college_field(self, i, field):
+        first = len(self.round_names) + len(self.category_names)
+        return self.string(first + i * len(_FIELDS) + _FIELDS.index(field))
+
+    def college_codes(self):
+        if self.codes is None:
+            self.codes = [self.college_field(i, 'college_code') for i in range(self.size)]
+        return self.codes
+
+    def college(self, i):
+        city_id, institution_type_id = self.ids[i].tolist()
+        return CollegeSummary(*(self.college_field(i, field) for field in _FIELDS),
+                             city_id=None if city_id == _NO_ID else city_id,
+                             institution_type_id=None if institution_type_id == _NO_ID else institution_type_id)
+
+    def colleges(self):
+        return MappedColleges(self)
+
+
+class CutoffStore:
+    """Read-only memory-mapped cutoffs shared by every worker on a host.
+
+    The file holds the (college, round, category) int32 tensor, the primary
+    cutoffs per (college, category), the model features and city/institution
+    ids per college and an offset table into a UTF-8 blob for round,
+    category and college strings. Pages live in the OS page cache
+    once, however many gunicorn workers map them. Writers build a new file
+    and rename it over the old one; readers notice on remap_if_changed and
+    switch to the new mapping. Code that reads several arrays should take
+    one snapshot() so a concurrent remap cannot mix two files.
+    """
+
+    REMAP_CHECK_SECONDS = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._mapping = _Mapping(path)
+
+    def snapshot(self):
+        """The current mapping: tensor, primary, names and college strings of one file"""
+        return self._mapping
+
+    @property
+    def size(self):
+        return self._mapping.size
+
+    def remap_if_changed(self, force=False):
+        """Map the file again if it was replaced since it was mapped; cheap enough per request"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.REMAP_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._mapping.identity:
+            return False
+        with self._lock:
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._mapping.identity:
+                # The old mmap is released once the last array view into it is gone
+                self._mapping = _Mapping(self.path)
+                logger.info("🔁 Remapped cutoff store %s (%d colleges)", self.path, self.size)
+        return True
+
+    @staticmethod
+    def write(path, colleges):
+        """Serialize college records and atomically rename the file into place"""
+        round_names, category_names, tensor = pack_cutoffs(colleges)
+        primary = pack_primary(colleges, category_names)
+        features = feature_matrix([college_features(college) for college in colleges])
+        ids = pack_ids(colleges)
+
+        strings = round_names + category_names
+        for college in colleges:
+            strings.extend([college.college_code, college.college_name, college.location, college.display_city])
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(s) for s in encoded])
+
+        tensor_at = _align(_HEADER.size)
+        primary_at = _align(tensor_at + tensor.nbytes)
+        features_at = _align(primary_at + primary.nbytes)
+        ids_at = _align(features_at + features.nbytes)
+        offsets_at = _align(ids_at + ids.nbytes)
+        blob_at = offsets_at + offsets.nbytes
+
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(colleges), len(round_names), len(category_names),
+                                 len(FEATURE_FIELDS), tensor_at, primary_at, features_at, ids_at, offsets_at, blob_at))
+            for at, array in ((tensor_at, tensor), (primary_at, primary), (features_at, features),
+                              (ids_at, ids), (offsets_at, offsets)):
+                f.write(b'\0' * (at - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.write(b''.join(encoded))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def build(cls, data_file, path, force=False):
+        """(Re)build the store from the college JSON if it is missing, stale or in an older format, then map it.
+
+        A file lock makes one worker build while the others wait and map
+        the result.
+        """
+        with open(f'{path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                stale = (_stored_version(path) != _VERSION
+                         or os.path.getmtime(path) < os.path.getmtime(data_file))
+                if force or stale:
+                    if is_database_file(data_file):
+                        colleges = CollegeDatabase(data_file).load_records()
+                    else:
+                        with open(data_file, 'r') as f:
+                            colleges = load_college_records(json.load(f))
+                    cls.write(path, colleges)
+                    logger.info("🗜️ Built cutoff store %s from %s (%d colleges)", path, data_file, len(colleges))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return cls(path)
@@ -3,59 +3,81 @@ import json
 import pandas as pd
 import numpy as np
 
+from college_database import CollegeDatabase, is_database_file
+from pgcet_records import EligibleCollege, load_college_records
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
 class EnhancedPGCETDataHandler:
     def __init__(self, json_file='combined_pgcet_data.json'):
         self.data_file = json_file
-        self.colleges_data = self.load_data()
+        # A .db file is queried per request instead of being loaded into memory
+        self.database = CollegeDatabase(json_file) if is_database_file(json_file) else None
+        self._colleges_data = None
         
+    @property
+    def colleges_data(self):
+        if self._colleges_data is None:
+            self._colleges_data = self.database.load_records() if self.database else self.load_data()
+        return self._colleges_data
+    
     def load_data(self):
         """Load combined college data"""
         with open(self.data_file, 'r') as f:
-            data = json.load(f)
-        print(f"📚 Loaded {len(data)} colleges from {self.data_file}")
+            data = load_college_records(json.load(f))
+        logger.info("📚 Loaded %d colleges from %s", len(data), self.data_file)
         return data
     
     def search_by_rank_advanced(self, student_rank, category, round_preference=None):
         """Advanced rank-based search with multiple rounds"""
+        if self.database:
+            return [EligibleCollege(
+                college_code=row['college_code'],
+                college_name=row['college_name'],
+                location=row['location'],
+                city=row['city'],
+                cutoff_rank=row['cutoff'],
+                round_used=row['round'],
+                safety_margin=row['cutoff'] - student_rank,
+                safety_level=self.calculate_safety_level(student_rank, row['cutoff'])
+            ) for row in self.database.search_by_rank(student_rank, category, round_preference)]
+        
         eligible_colleges = []
         
         for college in self.colleges_data:
-            # Check primary cutoffs
-            cutoffs = college.get('cutoffs', {})
-            rounds_data = college.get('rounds', {})
+            preferred_round = college.round_cutoffs(round_preference) if round_preference else None
             
-            # Determine which cutoff to use
-            cutoff_rank = None
+            # Determine which cutoff to use, primary cutoffs first
+            cutoff_rank = college.cutoffs.get(category)
             round_used = 'Primary'
             
-            if category in cutoffs and cutoffs[category] is not None:
-                cutoff_rank = cutoffs[category]
-            elif round_preference and round_preference in rounds_data:
-                if category in rounds_data[round_preference] and rounds_data[round_preference][category] is not None:
-                    cutoff_rank = rounds_data[round_preference][category]
+            if cutoff_rank is None and preferred_round is not None:
+                cutoff_rank = preferred_round.get(category)
+                if cutoff_rank is not None:
                     round_used = round_preference
-            else:
+            elif cutoff_rank is None:
                 # Try all available rounds
-                for round_name, round_cutoffs in rounds_data.items():
-                    if category in round_cutoffs and round_cutoffs[category] is not None:
-                        cutoff_rank = round_cutoffs[category]
-                        round_used = round_name
+                for round_cutoffs in college.rounds:
+                    cutoff_rank = round_cutoffs.get(category)
+                    if cutoff_rank is not None:
+                        round_used = round_cutoffs.round_name
                         break
             
             if cutoff_rank and student_rank <= cutoff_rank:
-                eligible_colleges.append({
-                    'college_code': college['collegeCode'],
-                    'college_name': college['collegeName'],
-                    'location': college['location'],
-                    'city': college['city'],
-                    'cutoff_rank': cutoff_rank,
-                    'round_used': round_used,
-                    'safety_margin': cutoff_rank - student_rank,
-                    'safety_level': self.calculate_safety_level(student_rank, cutoff_rank)
-                })
+                eligible_colleges.append(EligibleCollege(
+                    college_code=college.college_code,
+                    college_name=college.college_name,
+                    location=college.location,
+                    city=college.city,
+                    cutoff_rank=cutoff_rank,
+                    round_used=round_used,
+                    safety_margin=cutoff_rank - student_rank,
+                    safety_level=self.calculate_safety_level(student_rank, cutoff_rank)
+                ))
         
         # Sort by cutoff rank (best colleges first)
-        eligible_colleges.sort(key=lambda x: x['cutoff_rank'])
+        eligible_colleges.sort(key=lambda x: x.cutoff_rank)
         return eligible_colleges
     
     def calculate_safety_level(self, student_rank, cutoff_rank):
@@ -69,37 +91,51 @@ class EnhancedPGCETDataHandler:
     
     def get_round_wise_analysis(self, college_code, category):
         """Get cutoff trends across rounds for a college"""
-        college = next((c for c in self.colleges_data if c['collegeCode'] == college_code), None)
+        if self.database:
+            rows = self.database.round_cutoffs(college_code, category)
+            return {row['round']: row['cutoff'] for row in rows} if rows or self.database.has_college(college_code) else None
+        
+        college = next((c for c in self.colleges_data if c.college_code == college_code), None)
         if not college:
             return None
         
-        rounds_data = college.get('rounds', {})
         analysis = {}
         
-        for round_name, cutoffs in rounds_data.items():
-            if category in cutoffs and cutoffs[category] is not None:
-                analysis[round_name] = cutoffs[category]
+        for round_cutoffs in college.rounds:
+            cutoff = round_cutoffs.get(category)
+            if cutoff is not None:
+                analysis[round_cutoffs.round_name] = cutoff
         
         return analysis
     
     def get_statistics_advanced(self):
         """Get comprehensive statistics"""
+        if self.database:
+            stats = self.database.statistics()
+            return {
+                'total_colleges': stats['total_colleges'],
+                'unique_cities': len(stats['cities']),
+                'available_rounds': stats['rounds'],
+                'categories_with_data': stats['categories'],
+                'cities': stats['cities']
+            }
+        
         total_colleges = len(self.colleges_data)
         cities = set()
         rounds_available = set()
         categories_with_data = set()
         
         for college in self.colleges_data:
-            cities.add(college.get('city', 'Unknown'))
+            cities.add(college.city or 'Unknown')
             
             # Check primary cutoffs
-            for category, cutoff in college.get('cutoffs', {}).items():
+            for category, cutoff in college.cutoffs.items():
                 if cutoff is not None:
                     categories_with_data.add(category)
             
             # Check round data
-            for round_name in college.get('rounds', {}).keys():
-                rounds_available.add(round_name)
+            for round_cutoffs in college.rounds:
+                rounds_available.add(round_cutoffs.round_name)
         
         return {
             'total_colleges': total_colleges,
@@ -0,0 +1,159 @@
+import json
+import os
+import statistics
+
+from pgcet_records import CATEGORIES
+
+# Bundled allotment PDFs, the round they are loaded as and their golden output
+GOLDEN_PDFS = (('first.pdf', 'First Round'), ('second.pdf', 'Second Round'), ('third.pdf', 'Third Round'))
+GOLDEN_DIR = 'golden'
+
+MAX_RANK = 100000
+OUTLIER_RATIO = 8.0
+
+
+def round_quality(colleges, round_name, categories=CATEGORIES, outlier_ratio=OUTLIER_RATIO):
+    """Completeness, ordering and outlier checks for one round"""
+    present = {category: 0 for category in categories}
+    gm_violations, pair_violations, outliers = [], [], []
+    rows = 0
+
+    for college in colleges:
+        cutoffs = college.get('rounds', {}).get(round_name)
+        if not cutoffs:
+            continue
+        rows += 1
+        code = college['collegeCode']
+        values = {category: cutoffs.get(category) for category in categories if cutoffs.get(category)}
+        for category in values:
+            present[category] += 1
+
+        # General merit closes first: no reserved category should close on a better rank
+        gm = values.get('GM')
+        if gm and any(value < gm for category, value in values.items() if category != 'GM'):
+            gm_violations.append(code)
+
+        # "...G" seats are never harder to get than the matching "...H" seats
+        for category, value in values.items():
+            paired = category[:-1] + 'H'
+            if category.endswith('G') and values.get(paired) and value > values[paired]:
+                pair_violations.append([code, category, paired])
+
+        if values:
+            median = statistics.median(values.values())
+            for category, value in values.items():
+                if not 0 < value <= MAX_RANK or value > median * outlier_ratio or value * outlier_ratio < median:
+                    outliers.append([code, category, value, median])
+
+    return {
+        'rows': rows,
+        'completeness': {category: round(count / rows, 3) if rows else 0.0 for category, count in present.items()},
+        'filled_cells': round(sum(present.values()) / (rows * len(categories)), 3) if rows else 0.0,
+        'gm_violations': gm_violations,
+        'pair_violations': pair_violations,
+        'outliers': outliers
+    }
+
+
+def quality_report(colleges, round_names=None, categories=CATEGORIES):
+    """round_quality for every round present in the extracted colleges"""
+    if round_names is None:
+        round_names = []
+        for college in colleges:
+            for round_name in college.get('rounds', {}):
+                if round_name not in round_names:
+                    round_names.append(round_name)
+    return {round_name: round_quality(colleges, round_name, categories) for round_name in round_names}
+
+
+def golden_rows(colleges, round_name, categories=CATEGORIES):
+    """code -> cutoff vector for one round, the shape stored in the golden files"""
+    return {
+        college['collegeCode']: [college['rounds'][round_name].get(category) for category in categories]
+        for college in colleges if college.get('rounds', {}).get(round_name)
+    }
+
+
+def golden_path(pdf_file, golden_dir=GOLDEN_DIR):
+    return os.path.join(golden_dir, os.path.splitext(os.path.basename(pdf_file))[0] + '.json')
+
+
+def compare_golden(colleges, pdfs=GOLDEN_PDFS, golden_dir=GOLDEN_DIR, categories=CATEGORIES):
+    """Differences between extracted rounds and the golden files, per PDF"""
+    results = {}
+    for pdf_file, round_name in pdfs:
+        path = golden_path(pdf_file, golden_dir)
+        if not os.path.exists(path):
+            results[pdf_file] = {'error': f'{path} not found'}
+            continue
+        with open(path, 'r') as f:
+            golden = json.load(f)['rows']
+
+        actual = golden_rows(colleges, round_name, categories)
+        mismatched = []
+        for code in sorted(golden.keys() & actual.keys()):
+            for category, expected, value in zip(categories, golden[code], actual[code]):
+                if expected != value:
+                    mismatched.append([code, category, expected, value])
+
+        results[pdf_file] = {
+            'missing': sorted(golden.keys() - actual.keys()),
+            'unexpected': sorted(actual.keys() - golden.keys()),
+            'mismatched_cells': mismatched
+        }
+    return results
+
+
+def field_accuracy(colleges, pdf_file, round_name, golden_dir=GOLDEN_DIR, categories=CATEGORIES):
+    """Share of golden rows whose extracted value matches, per category; missing rows count as wrong"""
+    with open(golden_path(pdf_file, golden_dir), 'r') as f:
+        golden = json.load(f)['rows']
+    actual = golden_rows(colleges, round_name, categories)
+    correct = {category: 0 for category in categories}
+    for code, expected in golden.items():
+        if code not in actual:
+            continue
+        for category, expected_value, value in zip(categories, expected, actual[code]):
+            if expected_value == value:
+                correct[category] += 1
+    return {category: count / len(golden) if golden else 0.0 for category, count in correct.items()}
+
+
+def golden_passed(results):
+    return all('error' not in result and not any(result.values()) for result in results.values())
+
+
+def write_golden(colleges, pdfs=GOLDEN_PDFS, golden_dir=GOLDEN_DIR, categories=CATEGORIES):
+    os.makedirs(golden_dir, exist_ok=True)
+    for pdf_file, round_name in pdfs:
+        with open(golden_path(pdf_file, golden_dir), 'w') as f:
+            json.dump({'pdf': pdf_file, 'round': round_name, 'categories': list(categories),
+                       'rows': golden_rows(colleges, round_name, categories)}, f, indent=1)
+    print(f"✅ Wrote golden outputs for {len(pdfs)} PDFs to {golden_dir}/")
+
+
+if __name__ == "__main__":
+    import sys
+    from multi_pdf_extractor import MultiPDFExtractor
+
+    extractor = MultiPDFExtractor()
+    colleges = extractor.extract_all_pdfs([pdf_file for pdf_file, _ in GOLDEN_PDFS])
+
+    if '--update-golden' in sys.argv:
+        write_golden(colleges)
+
+    print("📊 Extraction quality:")
+    for round_name, quality in quality_report(colleges).items():
+        print(f"   {round_name}: {quality['rows']} rows, {quality['filled_cells']:.1%} cells filled, "
+              f"{len(quality['gm_violations'])} GM ordering, {len(quality['pair_violations'])} G/H ordering, "
+              f"{len(quality['outliers'])} outliers")
+
+    results = compare_golden(colleges)
+    for pdf_file, result in results.items():
+        if 'error' in result:
+            print(f"   ❌ {pdf_file}: {result['error']}")
+        else:
+            print(f"   {'✅' if not any(result.values()) else '❌'} {pdf_file}: {len(result['missing'])} missing, "
+                  f"{len(result['unexpected'])} unexpected, {len(result['mismatched_cells'])} mismatched cells")
+
+    exit(0 if golden_passed(results) else 1)
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+def preferred_encoding(available):
+    """'br' or 'gzip' if the client accepts it and we have it, else None"""
+    for encoding in ('br', 'gzip'):
+        if encoding in available and request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class PrecompressedPage:
+    """A page rendered and compressed once at startup.
+
+    Each encoding is a separate representation with its own strong ETag,
+    so clients and CDNs can revalidate with If-None-Match and get a 304
+    without the body being touched again.
+    """
+
+    def __init__(self, body, mimetype='text/html', max_age=300):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.mimetype = mimetype
+        self.max_age = max_age
+        self.etag = hashlib.sha256(data).hexdigest()[:16]
+        self.variants = {None: data, 'gzip': compress(data, 'gzip', 9)}
+        if brotli:
+            self.variants['br'] = compress(data, 'br', 11)
+
+    def response(self, status=200):
+        encoding = preferred_encoding(self.variants)
+        response = Response(self.variants[encoding], status=status, mimetype=self.mimetype)
+        response.set_etag(f'{self.etag}-{encoding}' if encoding else self.etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response.make_conditional(request) if status == 200 else response
+
+
+def not_modified(etag, cache_control):
+    """A 304 if the client already holds etag, so the body need not be built"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def conditional_json(response, etag=None, cache_control='no-cache'):
+    """Tag a JSON response (by default with a hash of its body) and answer If-None-Match.
+
+    The ETag is weak so it stays valid after compress_response gzips the body.
+    """
+    response.set_etag(etag or hashlib.sha256(response.get_data()).hexdigest()[:16], weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+
+def compress_response(response):
+    """after_request hook: compress larger JSON bodies the client accepts"""
+    if (response.status_code != 200 or response.direct_passthrough or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return response
+    encoding = preferred_encoding(('br', 'gzip') if brotli else ('gzip',))
+    if encoding:
+        response.set_data(compress(data, encoding, 5 if encoding == 'br' else 6))
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,254 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+class ModelArtifactStore:
+    """Versioned local cache for the downloaded ML model.
+
+    Downloads go to a ``.part`` file and resume with HTTP Range requests,
+    the result is verified and only then renamed into place, so a
+    truncated or corrupt download (or an HTML interstitial) is never
+    served. Verification uses, in order: the pinned sha256, the checksum
+    published at sha256_url, or, when neither is available, the validate
+    callable (e.g. "does it load as a model"). When nothing can be fetched,
+    a local_path file that passes the same verification is used instead.
+    A file lock makes all gunicorn workers on a host share one download.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, url, filename='advanced_pgcet_model.pkl', cache_dir='model_cache',
+                 sha256=None, version=None, max_attempts=3, timeout=(10, 60),
+                 sha256_url=None, validate=None, local_path=None):
+        self.url = url
+        self.filename = filename
+        self.cache_dir = cache_dir
+        self.sha256 = sha256.lower() if sha256 else None
+        self.sha256_url = sha256_url
+        self.validate = validate
+        self.local_path = local_path
+        self.version = version or (self.sha256[:12] if self.sha256 else 'default')
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    @property
+    def version_dir(self):
+        return os.path.join(self.cache_dir, self.version)
+
+    @property
+    def artifact_path(self):
+        return os.path.join(self.version_dir, self.filename)
+
+    @property
+    def partial_path(self):
+        return self.artifact_path + '.part'
+
+    @property
+    def manifest_path(self):
+        return self.artifact_path + '.json'
+
+    @property
+    def lock_path(self):
+        return os.path.join(self.version_dir, '.lock')
+
+    def file_sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def is_valid(self):
+        """Check the cached artifact against its manifest and expected checksum"""
+        if not os.path.exists(self.artifact_path) or not os.path.exists(self.manifest_path):
+            return False
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if self.sha256 and manifest.get('sha256') != self.sha256:
+            return False
+        # Manifests written before verification was recorded may describe an unchecked file
+        if not manifest.get('verified_by'):
+            return False
+        if os.path.getsize(self.artifact_path) != manifest.get('size'):
+            return False
+        return self.file_sha256(self.artifact_path) == manifest.get('sha256')
+
+    def expected_sha256(self):
+        """The pinned checksum, else the one published at sha256_url, else None"""
+        if self.sha256 or not self.sha256_url:
+            return self.sha256
+        import requests
+
+        response = requests.get(self.sha256_url, timeout=self.timeout)
+        response.raise_for_status()
+        # sha256sum format: "<hex digest>  <filename>"
+        digest = response.text.split()[0].lower() if response.text.split() else ''
+        if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+            raise RuntimeError(f"no sha256 digest at {self.sha256_url}")
+        return digest
+
+    def verify(self, path, expected):
+        """How path was verified ('sha256' or 'content'); raises when it does not pass"""
+        if expected:
+            digest = self.file_sha256(path)
+            if digest != expected:
+                raise RuntimeError(f"checksum mismatch (expected {expected}, got {digest})")
+            return 'sha256'
+        if self.validate is None:
+            raise RuntimeError(f"no checksum or validator to verify {self.filename} with")
+        try:
+            self.validate(path)
+        except Exception as e:
+            raise RuntimeError(f"{self.filename} failed validation: {e}") from e
+        return 'content'
+
+    def fetch(self):
+        """Return the path of a verified artifact, downloading it if needed"""
+        try:
+            return self._fetch()
+        except Exception as e:
+            local = self._local_fallback()
+            if local is None:
+                raise
+            logger.warning("⚠️ Could not fetch %s (%s); using local %s", self.filename, e, local)
+            return local
+
+    def _fetch(self):
+        os.makedirs(self.version_dir, exist_ok=True)
+
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self.is_valid():
+                    logger.info("✅ %s (%s) already cached", self.filename, self.version)
+                    return self.artifact_path
+
+                last_error = None
+                for attempt in range(1, self.max_attempts + 1):
+                    try:
+                        expected = self.expected_sha256()
+                        self._download()
+                        return self._commit(expected)
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("⚠️ Download attempt %d/%d failed: %s", attempt, self.max_attempts, e)
+                        if attempt < self.max_attempts:
+                            time.sleep(min(2 ** attempt, 10))
+                raise RuntimeError(f"Could not fetch {self.filename}: {last_error}")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _local_fallback(self):
+        """local_path if it exists and passes verification, else None"""
+        if not self.local_path or not os.path.exists(self.local_path):
+            return None
+        try:
+            # Only the pinned checksum: a published one may be unreachable like the artifact
+            self.verify(self.local_path, self.sha256)
+        except Exception as e:
+            logger.warning("⚠️ Local %s is not usable: %s", self.local_path, e)
+            return None
+        return self.local_path
+
+    def discard(self):
+        """Drop the cached artifact, e.g. after it failed to load, so the next fetch downloads again"""
+        if not os.path.isdir(self.version_dir):
+            return
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                for path in (self.manifest_path, self.artifact_path, self.partial_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                logger.warning("🗑️ Discarded cached %s (%s)", self.filename, self.version)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def fetch_in_background(self, on_ready, on_error=None):
+        """Run fetch() on a daemon thread and hand the path to on_ready"""
+        def run():
+            try:
+                path = self.fetch()
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                else:
+                    logger.error("❌ Error fetching %s: %s", self.filename, e)
+                return
+            on_ready(path)
+
+        thread = threading.Thread(target=run, name='model-fetch', daemon=True)
+        thread.start()
+        return thread
+
+    def _download(self):
+        """Download into the .part file, resuming from whatever is there"""
+        import requests
+
+        offset = os.path.getsize(self.partial_path) if os.path.exists(self.partial_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        logger.info("📥 Downloading %s (%s)...", self.filename, f'resuming at {offset}' if offset else 'from start')
+        with requests.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Range not satisfiable: the .part already holds the whole file
+                return
+            if response.status_code == 206:
+                mode = 'ab'
+                total_size = offset + int(response.headers.get('content-length', 0))
+            elif response.status_code == 200:
+                # Server ignored the Range header, start over
+                mode, offset = 'wb', 0
+                total_size = int(response.headers.get('content-length', 0))
+            else:
+                raise RuntimeError(f"status code {response.status_code}")
+
+            downloaded = offset
+            next_report = 10
+            with open(self.partial_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    downloaded += len(chunk)
+
+                    if total_size > 0:
+                        percent = downloaded * 100 // total_size
+                        if percent >= next_report:
+                            logger.info("📊 Progress: %d%%", percent)
+                            next_report = (percent // 10 + 1) * 10
+
+        if total_size and downloaded != total_size:
+            raise RuntimeError(f"incomplete download ({downloaded}/{total_size} bytes)")
+
+    def _commit(self, expected):
+        """Verify the .part file and atomically rename it into place"""
+        try:
+            verified_by = self.verify(self.partial_path, expected)
+        except Exception:
+            os.remove(self.partial_path)
+            raise
+        digest = self.file_sha256(self.partial_path)
+
+        size = os.path.getsize(self.partial_path)
+        os.replace(self.partial_path, self.artifact_path)
+
+        manifest_tmp = self.manifest_path + '.tmp'
+        with open(manifest_tmp, 'w') as f:
+            json.dump({'sha256': digest, 'size': size, 'url': self.url, 'verified_by': verified_by,
+                       'fetched_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+        os.replace(manifest_tmp, self.manifest_path)
+
+        logger.info("✅ Stored %s (%s, sha256 %s, verified by %s)", self.filename, self.version, digest[:12], verified_by)
+        return self.artifact_path
@@ -1,15 +1,41 @@
 # Create multi_pdf_extractor.py
 import PyPDF2
 import re
+import sys
 import json
 from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from college_database import CollegeDatabase
+from college_normalizer import CollegeNormalizer
+from cutoff_bundle import BUNDLE_FILE, write_bundle
+from extraction_quality import quality_report
+from pgcet_records import load_college_records
+
+
+@dataclass(slots=True)
+class CutoffRow:
+    """One college row from an allotment PDF"""
+    college_code: str
+    text: str
+    columns: Optional[list] = None
+    values: Optional[list] = None
+    course: Optional[str] = None
+
 
 class MultiPDFExtractor:
+    # Cells are right-aligned in a fixed-pitch font, about 3pt per character
+    CHAR_WIDTH = 3.0
+    # " MC  - MCA" in the left margin, on the same line as the course's values
+    COURSE_LABEL = re.compile(r'[A-Z]{1,2}\s+-\s+(\S.*)')
+    COURSE = 'MCA'
+    
     def __init__(self):
         self.categories = ['1G','1H','2AG','2AH','2BG','2BH','3AG','3AH',
                           '3BG','3BH','GM','GMH','NKN','PH','SCG','SCH',
                           'STG','STH','XD']
         self.combined_data = {}
+        self.validation = {}
         
     def extract_from_single_pdf(self, pdf_path, round_name):
         """Extract data from a single PDF"""
@@ -17,75 +43,124 @@ class MultiPDFExtractor:
         
         with open(pdf_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-        
-        # Extract college information
-        college_pattern = r'(C\d{3})\s+(.+?)\s+([A-Z\s,.\-()&]+)(?=\n)'
-        colleges = re.findall(college_pattern, text)
+            rows, text, stats = self.tokenize_rows(reader)
         
         # Extract year from document (if mentioned)
         year_match = re.search(r'PGCET-(\d{4})', text)
         year = int(year_match.group(1)) if year_match else 2022
         
-        # Process colleges
-        extracted_colleges = {}
-        for code, name, location in colleges:
-            extracted_colleges[code] = {
-                'collegeCode': code,
+        self.validation[round_name] = stats
+        print(f"   🔎 {stats['rows']} rows, {stats['complete_rows']} complete, "
+              f"{stats['rows_without_values']} without values, {stats['unmatched_cells']} unmatched cells")
+        
+        for row in rows:
+            # "C401  Name  Locality, CITY" - the name and the address are separated by two spaces
+            name, _, location = row.text[len(row.college_code):].strip().partition('  ')
+            location = location.strip()
+            college_info = {
+                'collegeCode': row.college_code,
                 'collegeName': name.strip(),
-                'location': location.strip(),
-                'city': location.split(',')[-1].strip() if ',' in location else location.strip()
+                'location': location,
+                'city': location.split(',')[-1].strip() if ',' in location else location
             }
-        
-        # Extract cutoff ranks in blocks
-        # This is a simplified extraction - you may need to adjust based on exact PDF format
-        rank_blocks = self.extract_cutoff_blocks(text, len(extracted_colleges))
-        
-        # Combine college info with cutoffs
-        college_list = list(extracted_colleges.keys())
-        for i, (college_code, college_info) in enumerate(extracted_colleges.items()):
+            
             cutoffs = {}
-            if i < len(rank_blocks):
-                for j, category in enumerate(self.categories):
-                    if j < len(rank_blocks[i]):
-                        cutoff_value = rank_blocks[i][j]
-                        cutoffs[category] = int(cutoff_value) if cutoff_value.isdigit() else None
-                    else:
-                        cutoffs[category] = None
+            if row.values:
+                for category, cutoff_value in zip(self.categories, row.values):
+                    cutoffs[category] = int(cutoff_value) if cutoff_value and cutoff_value.isdigit() else None
             
             college_info['cutoffs'] = cutoffs
             college_info['round'] = round_name
             college_info['year'] = year
             
             # Add to combined data
-            if college_code not in self.combined_data:
-                self.combined_data[college_code] = college_info
-                self.combined_data[college_code]['rounds'] = {}
+            if row.college_code not in self.combined_data:
+                self.combined_data[row.college_code] = college_info
+                self.combined_data[row.college_code]['rounds'] = {}
             
             # Store round-specific cutoffs
-            self.combined_data[college_code]['rounds'][round_name] = cutoffs
+            self.combined_data[row.college_code]['rounds'][round_name] = cutoffs
     
-    def extract_cutoff_blocks(self, text, num_colleges):
-        """Extract cutoff rank blocks from PDF text"""
-        # Find all numeric values and "--" patterns
-        rank_pattern = r'(\d{4,5}|--)'
-        ranks = re.findall(rank_pattern, text)
+    def tokenize_rows(self, reader):
+        """Single pass over positioned text runs, one CutoffRow per college code.
         
-        # Group ranks into blocks (19 categories per college)
-        blocks = []
-        categories_per_college = len(self.categories)
+        Each college in the allotment PDFs is three lines: "C401  name  address"
+        (sometimes wrapped), a category header and the cutoff values, one values
+        line per course. Digits of neighbouring cells run together in
+        extract_text(), so values are placed by x position against the header
+        cells instead of by counting numbers.
+        """
+        rows, pages_text = [], []
+        stats = {'rows': 0, 'complete_rows': 0, 'partial_rows': 0, 'rows_without_values': 0,
+                 'page_break_repeats': 0, 'unmatched_cells': 0, 'other_courses': 0}
+        known_categories = set(self.categories)
+        row = None
         
-        # Skip initial ranks (college codes) and extract cutoff blocks
-        start_idx = num_colleges
-        for i in range(num_colleges):
-            block_start = start_idx + (i * categories_per_college)
-            block_end = block_start + categories_per_college
-            if block_end <= len(ranks):
-                blocks.append(ranks[block_start:block_end])
+        for page in reader.pages:
+            lines = defaultdict(list)
+            
+            def visit(text, cm, tm, font_dict, font_size):
+                if text.strip():
+                    lines[round(tm[5], 1)].append((tm[4], text.strip()))
+            
+            pages_text.append(page.extract_text(visitor_text=visit))
+            
+            # Top to bottom, cells left to right
+            for y in sorted(lines, reverse=True):
+                cells = sorted(lines[y])
+                texts = [text for _, text in cells]
+                starts = [text for text in texts if text[:1] == 'C' and text[1:4].isdigit() and text[4:5] in ('', ' ')]
+                
+                if starts:
+                    code = starts[0][:4]
+                    if row is not None and row.college_code == code and row.values is None:
+                        # Row split by a page break is printed again on the next page
+                        stats['page_break_repeats'] += 1
+                        row.text = starts[0]
+                        continue
+                    row = CutoffRow(code, starts[0])
+                    rows.append(row)
+                elif row is None:
+                    continue
+                elif all(text in known_categories for text in texts):
+                    row.columns = [(x + len(text) * self.CHAR_WIDTH, text) for x, text in cells]
+                elif row.columns and any(text == '--' or text.isdigit() for text in texts):
+                    # A few colleges list specialisations (MCA-AI ML, ...) after the MCA line;
+                    # keep the plain MCA values, otherwise the first course printed
+                    labels = [match.group(1) for match in map(self.COURSE_LABEL.fullmatch, texts) if match]
+                    course = labels[0] if labels else None
+                    if row.values is None or (course == self.COURSE and row.course != self.COURSE):
+                        self.place_values(row, cells, stats)
+                        row.course = course
+                    else:
+                        stats['other_courses'] += 1
+                elif not row.columns:
+                    # Wrapped name/address line
+                    row.text = f"{row.text}  {' '.join(texts)}"
         
-        return blocks
+        for row in rows:
+            if row.values is None:
+                stats['rows_without_values'] += 1
+            elif all(value is not None for value in row.values):
+                stats['complete_rows'] += 1
+            else:
+                stats['partial_rows'] += 1
+        stats['rows'] = len(rows)
+        return rows, '\n'.join(pages_text), stats
+    
+    def place_values(self, row, cells, stats):
+        """Assign each value cell to the header column whose right edge is closest"""
+        index = {category: i for i, category in enumerate(self.categories)}
+        row.values = [None] * len(self.categories)
+        for x, text in cells:
+            if not (text == '--' or text.isdigit()):
+                continue
+            right = x + len(text) * self.CHAR_WIDTH
+            edge, category = min(row.columns, key=lambda column: abs(column[0] - right))
+            if abs(edge - right) > self.CHAR_WIDTH * 3 or row.values[index[category]] is not None:
+                stats['unmatched_cells'] += 1
+                continue
+            row.values[index[category]] = text
     
     def extract_all_pdfs(self, pdf_files):
         """Extract data from all PDF files"""
@@ -119,6 +194,10 @@ class MultiPDFExtractor:
         with open(filename, 'w') as f:
             json.dump(data, f, indent=2)
         print(f"✅ Saved {len(data)} colleges to {filename}")
+    
+    def save_database(self, data, filename='pgcet_data.db'):
+        """Optional SQLite copy for the data handler and predictor (pass a .db path to them)"""
+        CollegeDatabase.create(filename, data)
 
 # Usage
 if __name__ == "__main__":
@@ -128,8 +207,23 @@ if __name__ == "__main__":
     pdf_files = ['first.pdf', 'second.pdf', 'third.pdf']
     combined_colleges = extractor.extract_all_pdfs(pdf_files)
     
+    # Canonical names, cities and integer codes, one record per college code
+    normalizer = CollegeNormalizer.from_reference_file('pgcet_colleges_data.json')
+    combined_colleges = normalizer.normalize(combined_colleges)
+    print(f"🧹 Normalized: {normalizer.stats}")
+    
     # Save combined data
     extractor.save_combined_data(combined_colleges)
+    if '--sqlite' in sys.argv:
+        extractor.save_database(combined_colleges)
+    
+    # Offline cutoff bundle for the mobile page (the app also rebuilds it when the JSON is newer)
+    bundle_version = write_bundle(load_college_records(combined_colleges), BUNDLE_FILE)
+    print(f"📦 Saved cutoff bundle {BUNDLE_FILE} ({bundle_version})")
     
     print(f"🎯 Total colleges extracted: {len(combined_colleges)}")
     print(f"📊 Unique locations: {len(set([c['city'] for c in combined_colleges]))}")
+    
+    # Completeness, ordering and outlier checks; extraction_quality.py also diffs against golden/
+    for round_name, quality in quality_report(combined_colleges).items():
+        print(f"🔬 {round_name}: {quality['filled_cells']:.1%} cells filled, {len(quality['outliers'])} outliers")
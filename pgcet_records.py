@@ -0,0 +1,300 @@
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import numpy as np
+
+from college_normalizer import CITY_IDS, TIER1_CITIES, institution_flags, tier1_city_ids
+
+
+# Category order used by MultiPDFExtractor; records loaded from JSON share
+# one interned tuple per distinct key order instead of a dict per round.
+CATEGORIES = ('1G', '1H', '2AG', '2AH', '2BG', '2BH', '3AG', '3AH',
+              '3BG', '3BH', 'GM', 'GMH', 'NKN', 'PH', 'SCG', 'SCH',
+              'STG', 'STH', 'XD')
+
+_category_tuples = {CATEGORIES: CATEGORIES}
+
+
+def _intern_categories(categories):
+    categories = tuple(categories)
+    return _category_tuples.setdefault(categories, categories)
+
+
+def _to_cutoff(value):
+    if value is None:
+        return None
+    return int(value) if str(value).isdigit() else None
+
+
+@dataclass(slots=True)
+class RoundCutoffs:
+    """Cutoff ranks for one round, aligned to a shared category tuple"""
+    round_name: str
+    categories: tuple
+    values: tuple
+
+    @classmethod
+    def from_dict(cls, round_name, cutoffs):
+        return cls(round_name, _intern_categories(cutoffs.keys()),
+                   tuple(_to_cutoff(v) for v in cutoffs.values()))
+
+    def get(self, category):
+        try:
+            return self.values[self.categories.index(category)]
+        except ValueError:
+            return None
+
+    def items(self):
+        return zip(self.categories, self.values)
+
+    def available(self):
+        """Cutoffs that are actually present in this round"""
+        return [v for v in self.values if v is not None]
+
+    def to_dict(self):
+        return dict(zip(self.categories, self.values))
+
+
+@dataclass(slots=True)
+class CollegeRecord:
+    college_code: str
+    college_name: str
+    location: str
+    city: Optional[str]
+    cutoffs: RoundCutoffs
+    rounds: tuple
+    round: Optional[str] = None
+    year: Optional[int] = None
+    # Integer codes from CollegeNormalizer; None for data that was not normalized
+    city_id: Optional[int] = None
+    institution_type_id: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, college):
+        rounds = tuple(RoundCutoffs.from_dict(name, cutoffs)
+                       for name, cutoffs in college.get('rounds', {}).items())
+        return cls(
+            college_code=college.get('collegeCode', ''),
+            college_name=college.get('collegeName', ''),
+            location=college.get('location', ''),
+            city=college.get('city'),
+            cutoffs=RoundCutoffs.from_dict('Primary', college.get('cutoffs', {})),
+            rounds=rounds,
+            round=college.get('round'),
+            year=college.get('year'),
+            city_id=college.get('cityId'),
+            institution_type_id=college.get('institutionTypeId')
+        )
+
+    @property
+    def display_city(self):
+        return self.city or self.location.split(',')[-1].strip()
+
+    def round_cutoffs(self, round_name):
+        return next((r for r in self.rounds if r.round_name == round_name), None)
+
+    def rounds_or_primary(self):
+        """All rounds, or the primary cutoffs when no round data exists"""
+        return self.rounds or (self.cutoffs,)
+
+    def to_dict(self):
+        college = {
+            'collegeCode': self.college_code,
+            'collegeName': self.college_name,
+            'location': self.location
+        }
+        if self.city is not None:
+            college['city'] = self.city
+        if self.city_id is not None:
+            college['cityId'] = self.city_id
+        if self.institution_type_id is not None:
+            college['institutionTypeId'] = self.institution_type_id
+        college['cutoffs'] = self.cutoffs.to_dict()
+        if self.round is not None:
+            college['round'] = self.round
+        if self.year is not None:
+            college['year'] = self.year
+        if self.rounds:
+            college['rounds'] = {r.round_name: r.to_dict() for r in self.rounds}
+        return college
+
+
+@dataclass(slots=True)
+class CollegeFeatures:
+    """Per-college model features, computed once and shared by predictions"""
+    is_bangalore: int
+    is_mysore: int
+    is_hubli: int
+    is_mangalore: int
+    is_tier1_city: int
+    is_university: int
+    is_institute_tech: int
+    is_college: int
+    is_government: int
+    is_autonomous: int
+    min_cutoff: int
+    max_cutoff: int
+    avg_cutoff: float
+    cutoff_range: int
+    total_categories_available: int
+    has_multiple_rounds: bool
+    rounds_count: int
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_row(cls, row):
+        """Features from one feature_matrix row"""
+        return cls(*(kind(value) for kind, value in zip(_FEATURE_TYPES, row.tolist())))
+
+
+FEATURE_FIELDS = tuple(field.name for field in fields(CollegeFeatures))
+_FEATURE_TYPES = tuple(field.type for field in fields(CollegeFeatures))
+
+
+def college_features(college):
+    """Model features of one CollegeRecord"""
+    # Get cutoffs from all rounds
+    all_cutoffs = []
+    for round_data in college.rounds:
+        all_cutoffs.extend(round_data.available())
+
+    # If no round data, use primary cutoffs
+    if not all_cutoffs:
+        all_cutoffs = college.cutoffs.available()
+
+    return summary_features(college, all_cutoffs, len(college.rounds))
+
+
+def summary_features(college, all_cutoffs, rounds_count):
+    """Model features from a college's names and ids, its cutoffs and how many rounds it has"""
+    name = college.college_name.upper()
+    if college.city_id is not None:
+        # Normalized data: compare integer city codes instead of scanning the location
+        city_ids = tier1_city_ids(college.city_id)
+    else:
+        location = college.location.upper()
+        city_ids = {CITY_IDS[city] for city in TIER1_CITIES if city in location}
+    if college.institution_type_id is not None:
+        institution = institution_flags(college.institution_type_id)
+    else:
+        institution = {
+            'is_university': 1 if 'UNIVERSITY' in name else 0,
+            'is_institute_tech': 1 if any(word in name for word in ['INSTITUTE OF TECHNOLOGY', 'ENGINEERING', 'TECHNICAL']) else 0,
+            'is_college': 1 if 'COLLEGE' in name else 0,
+            'is_government': 1 if any(word in name for word in ['UNIVERSITY', 'GOVERNMENT', 'GOVT']) else 0
+        }
+
+    return CollegeFeatures(
+        # Location features
+        is_bangalore=1 if CITY_IDS['BANGALORE'] in city_ids else 0,
+        is_mysore=1 if CITY_IDS['MYSORE'] in city_ids else 0,
+        is_hubli=1 if CITY_IDS['HUBLI'] in city_ids else 0,
+        is_mangalore=1 if CITY_IDS['MANGALORE'] in city_ids else 0,
+        is_tier1_city=1 if city_ids else 0,
+
+        # Institution type and prestige indicators
+        **institution,
+        is_autonomous=1 if 'AUTONOMOUS' in name else 0,
+
+        # Cutoff-based features
+        min_cutoff=min(all_cutoffs) if all_cutoffs else 8000,
+        max_cutoff=max(all_cutoffs) if all_cutoffs else 12000,
+        avg_cutoff=np.mean(all_cutoffs) if all_cutoffs else 10000,
+        cutoff_range=max(all_cutoffs) - min(all_cutoffs) if len(all_cutoffs) > 1 else 0,
+        total_categories_available=len(all_cutoffs),
+
+        # Round availability
+        has_multiple_rounds=rounds_count > 1,
+        rounds_count=rounds_count
+    )
+
+
+def feature_matrix(features):
+    """(college, FEATURE_FIELDS) float64 array from CollegeFeatures"""
+    return np.array([[getattr(feature, name) for name in FEATURE_FIELDS] for feature in features],
+                    dtype=float).reshape(len(features), len(FEATURE_FIELDS))
+
+
+@dataclass(slots=True)
+class CollegeSummary:
+    """The per-college fields serving reads, without cutoffs"""
+    college_code: str
+    college_name: str
+    location: str
+    display_city: str
+    city_id: Optional[int] = None
+    institution_type_id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class CollegePrediction:
+    college_code: str
+    college_name: str
+    location: str
+    city: str
+    cutoff_rank: int
+    best_round: str
+    admission_probability: float
+    safety_level: str
+    rank_difference: int
+    preference_match: bool
+    college_features: Optional[CollegeFeatures] = None
+    probability_low: Optional[float] = None
+    probability_high: Optional[float] = None
+    # Set when predictions for several categories are merged
+    category: Optional[str] = None
+
+    def to_dict(self):
+        prediction = {
+            'college_code': self.college_code,
+            'college_name': self.college_name,
+            'location': self.location,
+            'city': self.city,
+            'cutoff_rank': self.cutoff_rank,
+            'best_round': self.best_round,
+        }
+        if self.category is not None:
+            prediction['category'] = self.category
+        prediction.update({
+            'admission_probability': float(self.admission_probability),
+            'safety_level': self.safety_level,
+            'rank_difference': self.rank_difference
+        })
+        if self.probability_low is not None:
+            prediction['probability_interval'] = [float(self.probability_low), float(self.probability_high)]
+        if self.college_features is not None:
+            prediction['college_features'] = self.college_features.to_dict()
+        prediction['preference_match'] = self.preference_match
+        return prediction
+
+
+@dataclass(slots=True)
+class EligibleCollege:
+    college_code: str
+    college_name: str
+    location: str
+    city: str
+    cutoff_rank: int
+    round_used: str
+    safety_margin: int
+    safety_level: str
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def load_college_records(colleges):
+    """Build records from the parsed combined_pgcet_data.json list"""
+    return [CollegeRecord.from_dict(college) for college in colleges]
+
+
+def serialize(value):
+    """Convert a record, or a list of records, to the existing JSON shape"""
+    to_dict = getattr(value, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    if isinstance(value, (list, tuple)):
+        return [serialize(item) for item in value]
+    return value
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from pgcet_records import CATEGORIES
+
+EXPORT_DIR = 'static_predictions'
+RANK_STEP = 50
+BUCKET_SIZE = 1000
+
+# Per prediction in a shard; college names and places are stored once per shard
+SHARD_COLUMNS = ('college_code', 'cutoff_rank', 'best_round', 'admission_probability', 'safety_level')
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def grid_rank(student_rank, step=RANK_STEP):
+    """The first exported rank at or above student_rank: the next multiple of step"""
+    return -(-student_rank // step) * step
+
+
+def bucket_start(rank, bucket_size=BUCKET_SIZE):
+    return (rank - 1) // bucket_size * bucket_size + 1
+
+
+def shard_rows(predictor, ranks, category, top_k=20, min_probability=0.2):
+    """rank -> compact top-k rows for default preferences, as /api/predict-mobile ranks them"""
+    college_idx, best_cutoffs, best_rounds, probabilities = predictor.rank_grid(ranks, category)
+    rows = {}
+    for r, student_rank in enumerate(ranks):
+        keep = np.flatnonzero(np.nan_to_num(probabilities[r]) > min_probability)
+        order = keep[predictor.select_top(np.zeros(len(keep), dtype=bool), probabilities[r, keep],
+                                          college_idx[keep], top_k)]
+        rows[str(student_rank)] = [[
+            predictor.college_codes[college_idx[p]],
+            int(best_cutoffs[r, p]),
+            predictor.round_names[best_rounds[r, p]],
+            round(float(probabilities[r, p]), 4),
+            predictor.calculate_safety_level(student_rank, int(best_cutoffs[r, p]))
+        ] for p in order.tolist()]
+    return rows
+
+
+def write_json_gz(path, payload):
+    """Write deterministically (no mtime in the gzip header) so unchanged shards keep their hash"""
+    data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    os.replace(temporary, path)
+
+
+def export_prediction_grid(predictor, out_dir=EXPORT_DIR, categories=CATEGORIES, step=RANK_STEP,
+                           bucket_size=BUCKET_SIZE, top_k=20, min_probability=0.2):
+    """Write gzip JSON shards out_dir/<category>/<bucket start>.json.gz and manifest.json.
+
+    Each shard answers the grid ranks (multiples of step) in one rank
+    bucket. Ranks above a category's highest cutoff have no eligible
+    colleges and get no shard. The manifest, written last, lists every
+    shard with its sha256 so clients can cache by hash.
+    """
+    if bucket_size % step:
+        raise ValueError(f"bucket_size {bucket_size} must be a multiple of step {step}")
+    started = time.perf_counter()
+    manifest = {
+        'format': 1,
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'data_sha256': file_sha256(predictor.data_file),
+        'model_sha256': file_sha256(predictor.model_file) if predictor.model_file else None,
+        'step': step,
+        'bucket_size': bucket_size,
+        'top_k': top_k,
+        'min_probability': min_probability,
+        'columns': list(SHARD_COLUMNS),
+        'categories': {}
+    }
+
+    colleges_by_code = {college.college_code: college for college in predictor.colleges_data}
+    for category in categories:
+        c = predictor.category_index.get(category)
+        max_rank = int(predictor.cutoff_tensor[:, :, c].max()) if c is not None else 0
+        os.makedirs(os.path.join(out_dir, category), exist_ok=True)
+        shards = {}
+        for start in range(1, grid_rank(max_rank, step) + 1, bucket_size):
+            ranks = list(range(grid_rank(start, step), min(start + bucket_size - 1, grid_rank(max_rank, step)) + 1, step))
+            rows = shard_rows(predictor, ranks, category, top_k, min_probability)
+            codes = sorted({row[0] for answer in rows.values() for row in answer})
+            colleges = {code: colleges_by_code[code] for code in codes}
+
+            name = f'{category}/{start:06d}.json.gz'
+            path = os.path.join(out_dir, name)
+            write_json_gz(path, {
+                'category': category,
+                'ranks': rows,
+                'colleges': {code: [college.college_name, college.location, college.display_city]
+                             for code, college in colleges.items()}
+            })
+            shards[str(start)] = {'file': name, 'sha256': file_sha256(path), 'bytes': os.path.getsize(path)}
+        manifest['categories'][category] = {'max_rank': max_rank, 'shards': shards}
+        print(f"📦 {category}: {len(shards)} shards up to rank {max_rank}")
+
+    temporary = os.path.join(out_dir, f'manifest.json.{os.getpid()}.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temporary, os.path.join(out_dir, 'manifest.json'))
+
+    total = sum(len(entry['shards']) for entry in manifest['categories'].values())
+    print(f"✅ Exported {total} shards to {out_dir}/ in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    import sys
+    from advanced_ml_predictor import AdvancedPGCETPredictor
+
+    model_file = sys.argv[1] if len(sys.argv) > 1 else 'advanced_pgcet_model.pkl'
+    data_file = sys.argv[2] if len(sys.argv) > 2 else 'combined_pgcet_data.json'
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else EXPORT_DIR
+
+    predictor = AdvancedPGCETPredictor.load_models(model_file, data_file, warm_uncertainty=False)
+    if not predictor.is_trained:
+        print(f"❌ Could not load {model_file}; train or download the model first")
+        exit(1)
+    export_prediction_grid(predictor, out_dir)
@@ -0,0 +1,87 @@
+import functools
+import threading
+import time
+
+from flask import jsonify, request
+
+
+class TokenBucketLimiter:
+    """In-memory token buckets per (endpoint, client), refilled lazily on use.
+
+    budgets maps an endpoint name to (tokens per second, burst). Clients
+    are keyed by X-API-Key when it is one of api_keys, else by remote
+    address, so made-up keys do not buy fresh buckets. Buckets that have
+    refilled completely carry no state and are swept out now and then; past
+    max_buckets the stalest are evicted, which can only favour the client.
+    """
+
+    SWEEP_SECONDS = 60.0
+
+    def __init__(self, budgets, api_keys=(), max_buckets=10000):
+        self.budgets = dict(budgets)
+        self.api_keys = frozenset(api_keys)
+        self.max_buckets = max_buckets
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        self.counts = {endpoint: {'allowed': 0, 'limited': 0} for endpoint in self.budgets}
+
+    def client_key(self):
+        api_key = request.headers.get('X-API-Key')
+        return f'key:{api_key}' if api_key in self.api_keys else f'ip:{request.remote_addr}'
+
+    def acquire(self, endpoint, client):
+        """0.0 if a token was taken, else seconds until one is available"""
+        rate, burst = self.budgets[endpoint]
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get((endpoint, client), (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[(endpoint, client)] = (tokens - 1, now)
+                self.counts[endpoint]['allowed'] += 1
+                wait = 0.0
+            else:
+                self._buckets[(endpoint, client)] = (tokens, now)
+                self.counts[endpoint]['limited'] += 1
+                wait = (1 - tokens) / rate
+            if now - self._swept_at > self.SWEEP_SECONDS or len(self._buckets) > self.max_buckets:
+                self._sweep(now)
+        return wait
+
+    def _sweep(self, now):
+        self._swept_at = now
+        for (endpoint, client), (tokens, updated) in list(self._buckets.items()):
+            rate, burst = self.budgets[endpoint]
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[(endpoint, client)]
+        if len(self._buckets) > self.max_buckets:
+            # Leave headroom so a flood of new clients does not sort on every request
+            excess = len(self._buckets) - self.max_buckets * 9 // 10
+            stalest = sorted(self._buckets, key=lambda bucket: self._buckets[bucket][1])[:excess]
+            for bucket in stalest:
+                del self._buckets[bucket]
+
+    def limit(self, endpoint):
+        """Route decorator answering 429 with Retry-After once the client's bucket is empty"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapped(*args, **kwargs):
+                wait = self.acquire(endpoint, self.client_key())
+                if wait:
+                    response = jsonify({'success': False, 'error': 'Too many requests, please retry later'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, round(wait)))
+                    return response
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._buckets),
+                'budgets': {endpoint: {'per_second': rate, 'burst': burst}
+                            for endpoint, (rate, burst) in self.budgets.items()},
+                'counts': {endpoint: dict(counts) for endpoint, counts in self.counts.items()}
+            }
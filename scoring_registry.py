@@ -0,0 +1,182 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ScoringEngine:
+    """A named scorer: (predictor, ranks, categories, college indices, cutoffs) -> probabilities"""
+
+    def __init__(self, name, score, needs_models=False, description=''):
+        self.name = name
+        self.score = score
+        self.needs_models = needs_models
+        self.description = description
+
+
+def _ensemble(predictor, student_rank, category, college_idx, cutoffs):
+    return predictor.ensemble_probabilities(student_rank, category, college_idx, cutoffs)
+
+
+def _regressor(predictor, student_rank, category, college_idx, cutoffs):
+    return predictor.ensemble_probabilities(student_rank, category, college_idx, cutoffs,
+                                            components=('probability',))
+
+
+def _analytic(predictor, student_rank, category, college_idx, cutoffs):
+    if np.ndim(category) == 0:
+        return predictor.analytic_model.predict(student_rank, cutoffs, category)
+    # Calibrated curves are per category
+    category = np.asarray(category)
+    ranks = np.broadcast_to(np.asarray(student_rank), len(category))
+    probabilities = np.empty(len(category))
+    for label in np.unique(category):
+        pairs = category == label
+        probabilities[pairs] = predictor.analytic_model.predict(ranks[pairs], np.asarray(cutoffs)[pairs], label)
+    return probabilities
+
+
+SCORING_REGISTRY = {}
+
+
+def register_engine(engine):
+    SCORING_REGISTRY[engine.name] = engine
+    return engine
+
+
+register_engine(ScoringEngine('ensemble', _ensemble, needs_models=True,
+                              description='classifier and regressor ensembles, averaged'))
+register_engine(ScoringEngine('regressor', _regressor, needs_models=True,
+                              description='the probability regressor alone, about half the ensemble cost'))
+register_engine(ScoringEngine('analytic', _analytic,
+                              description='closed-form margin curve, calibrated per category when available'))
+
+
+class _EngineMetrics:
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.samples = 0
+        self.errors = 0
+        self.abs_diff_sum = 0.0
+        self.compared = 0
+        self.agreements = 0
+        self.overlaps = deque(maxlen=window)
+
+    def report(self):
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'samples': self.samples,
+            'errors': self.errors,
+            'mean_latency_ms': round(float(latencies.mean()), 3) if len(latencies) else None,
+            'p95_latency_ms': round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+            'mean_abs_diff': round(self.abs_diff_sum / self.compared, 4) if self.compared else None,
+            'decision_agreement': round(self.agreements / self.compared, 4) if self.compared else None,
+            'top_k_overlap': round(float(np.mean(self.overlaps)), 4) if self.overlaps else None
+        }
+
+
+class ShadowEvaluator:
+    """Re-scores a sample of served requests with other engines on a background thread.
+
+    observe() runs on the request path and only draws a random number and
+    enqueues; when the queue is full the sample is dropped. The worker
+    scores each sample with every shadow engine and records latency, mean
+    absolute probability difference, admit/reject agreement at 0.5 and
+    top-k overlap against what was served.
+    """
+
+    def __init__(self, engines, sample_rate=0.05, top_k=20, max_pending=64, window=1000):
+        unknown = [name for name in engines if name not in SCORING_REGISTRY]
+        if unknown:
+            raise ValueError(f"Unknown shadow engines {unknown}, expected some of {tuple(SCORING_REGISTRY)}")
+        self.engines = list(engines)
+        self.sample_rate = sample_rate
+        self.top_k = top_k
+        self.window = window
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self.metrics = {}
+        self.dropped = 0
+        self._worker = threading.Thread(target=self._run, name='shadow-scoring', daemon=True)
+        self._worker.start()
+
+    def _metrics(self, name):
+        if name not in self.metrics:
+            self.metrics[name] = _EngineMetrics(self.window)
+        return self.metrics[name]
+
+    def observe(self, predictor, engine, elapsed, student_rank, category, college_idx, cutoffs, probabilities):
+        if not len(college_idx) or random.random() >= self.sample_rate:
+            return
+        try:
+            self._pending.put_nowait((predictor, engine, elapsed, student_rank, category,
+                                      college_idx, cutoffs, probabilities))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _top(self, probabilities):
+        """Positions of the top_k scored candidates, ignoring unscored ones"""
+        order = np.argsort(-np.nan_to_num(probabilities, nan=-1.0), kind='stable')[:self.top_k]
+        return set(order[~np.isnan(probabilities[order])].tolist())
+
+    def _run(self):
+        while True:
+            sample = self._pending.get()
+            try:
+                self._evaluate(*sample)
+            except Exception as e:
+                logger.warning("⚠️ Shadow evaluation failed: %s", e)
+
+    def _evaluate(self, predictor, served_engine, served_elapsed, student_rank, category,
+                  college_idx, cutoffs, served):
+        with self._lock:
+            metrics = self._metrics(served_engine)
+            metrics.samples += 1
+            metrics.latencies.append(served_elapsed)
+
+        for name in self.engines:
+            if name == served_engine:
+                continue
+            engine = SCORING_REGISTRY[name]
+            if engine.needs_models and not predictor.is_trained:
+                continue
+            started = time.perf_counter()
+            try:
+                shadow = np.asarray(engine.score(predictor, student_rank, category, college_idx, cutoffs), dtype=float)
+            except Exception as e:
+                with self._lock:
+                    self._metrics(name).errors += 1
+                logger.warning("⚠️ Shadow engine %s failed: %s", name, e)
+                continue
+            elapsed = time.perf_counter() - started
+
+            both = ~np.isnan(served) & ~np.isnan(shadow)
+            top_served = self._top(served)
+            top_shadow = self._top(shadow)
+            with self._lock:
+                metrics = self._metrics(name)
+                metrics.samples += 1
+                metrics.latencies.append(elapsed)
+                metrics.compared += int(both.sum())
+                metrics.abs_diff_sum += float(np.abs(served[both] - shadow[both]).sum())
+                metrics.agreements += int(((served[both] > 0.5) == (shadow[both] > 0.5)).sum())
+                if top_served:
+                    metrics.overlaps.append(len(top_served & top_shadow) / len(top_served))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'engines': self.engines,
+                'sample_rate': self.sample_rate,
+                'pending': self._pending.qsize(),
+                'dropped': self.dropped,
+                'metrics': {name: metrics.report() for name, metrics in self.metrics.items()}
+            }
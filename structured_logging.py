@@ -0,0 +1,118 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+
+# Set per request by bind_correlation_id; '-' outside requests
+correlation_id = contextvars.ContextVar('correlation_id', default='-')
+
+_STANDARD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'correlation_id'}
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def get_logger(name):
+    return logging.getLogger(f'pgcet.{name}')
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex[:12]
+
+
+def bind_correlation_id(value=None):
+    """Tag log records from this thread/context with value; returns the token for reset"""
+    return correlation_id.set(value or new_correlation_id())
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamps the caller's correlation id on the record before it is queued"""
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops repeats of the same warning template within window seconds.
+
+    Records are keyed by logger and unformatted message, so a warning
+    logged with varying %-arguments counts as one. The next record that
+    gets through carries the number suppressed since.
+    """
+
+    def __init__(self, window=60.0, level=logging.WARNING):
+        super().__init__()
+        self.window = window
+        self.level = level
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            sent_at, suppressed = self._last.get(key, (None, 0))
+            if sent_at is not None and now - sent_at < self.window:
+                self._last[key] = (sent_at, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, correlation id, message and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'correlation_id': getattr(record, 'correlation_id', '-'),
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in record.__dict__.items() if key not in _STANDARD_ATTRIBUTES})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, fmt=None, stream=None):
+    """Route pgcet.* loggers through a queue so request threads never block on output.
+
+    Records are filtered (rate limit, correlation id) and formatted into
+    the queue on the caller's thread; a listener thread writes them out.
+    Safe to call more than once.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        level = level or os.environ.get('PGCET_LOG_LEVEL', 'INFO')
+        fmt = fmt or os.environ.get('PGCET_LOG_FORMAT', 'json')
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(
+            '%(asctime)s %(levelname)s [%(correlation_id)s] %(name)s: %(message)s'))
+
+        records = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        handler.addFilter(RateLimitFilter())
+        handler.addFilter(CorrelationFilter())
+
+        logger = logging.getLogger('pgcet')
+        logger.setLevel(level)
+        logger.addHandler(handler)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, output)
+        _listener.start()
+        atexit.register(_listener.stop)
@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from extraction_quality import GOLDEN_PDFS, compare_golden, field_accuracy, golden_path, golden_rows
+from multi_pdf_extractor import MultiPDFExtractor
+from pgcet_records import CATEGORIES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, 'golden')
+PDFS = tuple((os.path.join(ROOT, pdf_file), round_name) for pdf_file, round_name in GOLDEN_PDFS)
+
+# Every category column of every bundled PDF must match the hand-checked golden rows this closely
+FIELD_ACCURACY = 0.99
+
+
+@pytest.fixture(scope='module')
+def colleges():
+    return MultiPDFExtractor().extract_all_pdfs([pdf_file for pdf_file, _ in PDFS])
+
+
+@pytest.mark.parametrize('pdf_file, round_name', PDFS, ids=[pdf_file for pdf_file, _ in GOLDEN_PDFS])
+def test_field_accuracy(colleges, pdf_file, round_name):
+    accuracy = field_accuracy(colleges, pdf_file, round_name, GOLDEN_DIR)
+    assert {category: value for category, value in accuracy.items() if value < FIELD_ACCURACY} == {}
+
+
+@pytest.mark.parametrize('pdf_file, round_name', PDFS, ids=[pdf_file for pdf_file, _ in GOLDEN_PDFS])
+def test_every_golden_college_extracted(colleges, pdf_file, round_name):
+    result = compare_golden(colleges, ((pdf_file, round_name),), GOLDEN_DIR)[pdf_file]
+    assert result['missing'] == []
+    assert result['unexpected'] == []
+
+
+def test_plain_mca_course_preferred(colleges):
+    # C584 prints MCA-GAME DESIGN, MCA and MCA-AI ML value lines in the third round
+    rows = golden_rows(colleges, 'Third Round')
+    assert rows['C584'][CATEGORIES.index('GM')] == 2466
+    assert rows['C584'][CATEGORIES.index('2AG')] == 3124
+
+
+def test_golden_files_cover_every_category():
+    for pdf_file, _ in PDFS:
+        with open(golden_path(pdf_file, GOLDEN_DIR)) as f:
+            golden = json.load(f)
+        assert golden['categories'] == list(CATEGORIES)
+        assert all(len(values) == len(CATEGORIES) for values in golden['rows'].values())
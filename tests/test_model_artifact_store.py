@@ -0,0 +1,176 @@
+import hashlib
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+import model_artifact_store
+from model_artifact_store import ModelArtifactStore
+
+MAGIC = b'MODEL'
+PAYLOAD = MAGIC + os.urandom(3 * ModelArtifactStore.CHUNK_SIZE + 123)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+INTERSTITIAL = b"<html><body>Google Drive can't scan this file for viruses.</body></html>"
+
+
+def starts_with_magic(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a model")
+
+
+@pytest.fixture
+def stand_in():
+    """Local server standing in for the model host.
+
+    /model serves PAYLOAD honouring Range, /interstitial answers 200 with
+    an HTML page and /model.sha256 publishes a sha256sum line.
+    """
+    ranges = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/interstitial':
+                body = INTERSTITIAL
+                self.send_response(200)
+            elif self.path == '/model.sha256':
+                body = f'{PAYLOAD_SHA256}  advanced_pgcet_model.pkl\n'.encode()
+                self.send_response(200)
+            elif self.path == '/model':
+                requested = self.headers.get('Range')
+                ranges.append(requested)
+                start = int(requested[len('bytes='):].rstrip('-')) if requested else 0
+                if start >= len(PAYLOAD):
+                    self.send_response(416)
+                    self.end_headers()
+                    return
+                body = PAYLOAD[start:]
+                if requested:
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+                else:
+                    self.send_response(200)
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}', ranges
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(model_artifact_store.time, 'sleep', lambda seconds: None)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_fresh_download_is_verified_and_stored(stand_in, tmp_path):
+    base, _ = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, sha256=PAYLOAD_SHA256)
+    assert read(store.fetch()) == PAYLOAD
+    assert store.is_valid()
+
+
+def test_partial_download_resumes_with_range(stand_in, tmp_path):
+    base, ranges = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, sha256=PAYLOAD_SHA256)
+    os.makedirs(store.version_dir)
+    with open(store.partial_path, 'wb') as f:
+        f.write(PAYLOAD[:1000])
+    assert read(store.fetch()) == PAYLOAD
+    assert ranges == ['bytes=1000-']
+
+
+def test_corrupt_part_is_rejected_and_downloaded_again(stand_in, tmp_path):
+    base, ranges = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, sha256=PAYLOAD_SHA256, max_attempts=2)
+    os.makedirs(store.version_dir)
+    with open(store.partial_path, 'wb') as f:
+        f.write(b'x' * 1000)
+    assert read(store.fetch()) == PAYLOAD
+    assert ranges == ['bytes=1000-', None]
+
+
+def test_interstitial_fails_the_checksum(stand_in, tmp_path):
+    base, _ = stand_in
+    store = ModelArtifactStore(f'{base}/interstitial', cache_dir=tmp_path, sha256=PAYLOAD_SHA256, max_attempts=1)
+    with pytest.raises(RuntimeError, match='checksum mismatch'):
+        store.fetch()
+    assert not os.path.exists(store.artifact_path)
+
+
+def test_published_checksum_is_used_when_none_is_pinned(stand_in, tmp_path):
+    base, _ = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, sha256_url=f'{base}/model.sha256')
+    store.fetch()
+    with open(store.manifest_path) as f:
+        assert json.load(f)['verified_by'] == 'sha256'
+
+    interstitial = ModelArtifactStore(f'{base}/interstitial', cache_dir=tmp_path, version='html',
+                                      sha256_url=f'{base}/model.sha256', max_attempts=1)
+    with pytest.raises(RuntimeError, match='checksum mismatch'):
+        interstitial.fetch()
+
+
+def test_without_a_checksum_the_validator_decides(stand_in, tmp_path):
+    base, _ = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, validate=starts_with_magic)
+    assert read(store.fetch()) == PAYLOAD
+    with open(store.manifest_path) as f:
+        assert json.load(f)['verified_by'] == 'content'
+
+    interstitial = ModelArtifactStore(f'{base}/interstitial', cache_dir=tmp_path, version='html',
+                                      validate=starts_with_magic, max_attempts=1)
+    with pytest.raises(RuntimeError, match='failed validation'):
+        interstitial.fetch()
+    assert not os.path.exists(interstitial.artifact_path)
+
+
+def test_unverified_manifest_is_not_reused(stand_in, tmp_path):
+    base, _ = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, validate=starts_with_magic)
+    os.makedirs(store.version_dir)
+    with open(store.artifact_path, 'wb') as f:
+        f.write(INTERSTITIAL)
+    with open(store.manifest_path, 'w') as f:
+        json.dump({'sha256': hashlib.sha256(INTERSTITIAL).hexdigest(), 'size': len(INTERSTITIAL)}, f)
+    assert not store.is_valid()
+    assert read(store.fetch()) == PAYLOAD
+
+
+def test_verified_local_model_is_the_fallback(stand_in, tmp_path):
+    base, _ = stand_in
+    local = tmp_path / 'advanced_pgcet_model.pkl'
+    local.write_bytes(PAYLOAD)
+    store = ModelArtifactStore(f'{base}/missing', cache_dir=tmp_path / 'cache', validate=starts_with_magic,
+                               local_path=str(local), max_attempts=1)
+    assert store.fetch() == str(local)
+
+    local.write_bytes(INTERSTITIAL)
+    with pytest.raises(RuntimeError, match='Could not fetch'):
+        store.fetch()
+
+
+def test_discard_forces_a_new_download(stand_in, tmp_path):
+    base, ranges = stand_in
+    store = ModelArtifactStore(f'{base}/model', cache_dir=tmp_path, sha256=PAYLOAD_SHA256)
+    store.fetch()
+    store.discard()
+    assert not store.is_valid()
+    assert read(store.fetch()) == PAYLOAD
+    assert ranges == [None, None]
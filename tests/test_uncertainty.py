@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+from advanced_ml_predictor import AdvancedPGCETPredictor
+from uncertainty import CutoffUncertainty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RANK, CATEGORY = 3000, 'GM'
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return AdvancedPGCETPredictor(os.path.join(ROOT, 'combined_pgcet_data.json'), 'analytic')
+
+
+@pytest.fixture(scope='module')
+def uncertainty(predictor):
+    return CutoffUncertainty(predictor, n_samples=400)
+
+
+def test_interval_centred_on_served_probability(predictor, uncertainty):
+    college_idx, _, _ = predictor.eligible_cutoffs(RANK, CATEGORY)
+    for served in (0.1, 0.5, 0.9, 0.98):
+        probabilities = np.full(len(college_idx), served)
+        low, high = uncertainty.intervals(RANK, CATEGORY, college_idx, probabilities)
+        assert (low <= probabilities).all() and (probabilities <= high).all()
+        assert (low >= 0).all() and (high <= 1).all()
+
+
+def test_interval_moves_with_served_probability(predictor, uncertainty):
+    college_idx, _, _ = predictor.eligible_cutoffs(RANK, CATEGORY)
+    lower = uncertainty.intervals(RANK, CATEGORY, college_idx, np.full(len(college_idx), 0.3))
+    upper = uncertainty.intervals(RANK, CATEGORY, college_idx, np.full(len(college_idx), 0.7))
+    assert (lower[0] <= upper[0]).all() and (lower[1] <= upper[1]).all()
+    # An offset band, not a fixed one: the ensemble's probability is what gets the interval
+    assert (upper[0] > lower[1]).any()
+
+
+def test_warm_stops_at_each_category_largest_cutoff(predictor):
+    uncertainty = CutoffUncertainty(predictor, n_samples=10)
+    uncertainty.warm(categories=[CATEGORY])
+    c = predictor.category_index[CATEGORY]
+    top = int(predictor.cutoff_tensor[:, :, c].max())
+    assert len(uncertainty._bands) == top // uncertainty.rank_bucket + 1